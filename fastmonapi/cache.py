@@ -0,0 +1,33 @@
+from config import settings
+
+class ResponseCache:
+    # Serialized response bodies shared by all workers through Redis. Only
+    # created when REDIS_URL is set; any Redis failure counts as a miss so the
+    # API keeps answering from Postgres.
+    __slots__ = ("_client", "_errors")
+
+    def __init__(self, url):
+        # Imported here so redis is only required when a cache is configured
+        import redis.asyncio
+        import redis.exceptions
+        self._client = redis.asyncio.Redis.from_url(
+            url,
+            socket_timeout=settings.redis_timeout,
+            socket_connect_timeout=settings.redis_timeout
+        )
+        self._errors = (redis.exceptions.RedisError, OSError)
+
+    async def get(self, key):
+        try:
+            return await self._client.get(key)
+        except self._errors:
+            return None
+
+    async def set(self, key, body, ttl):
+        try:
+            await self._client.set(key, body, ex=ttl)
+        except self._errors:
+            pass
+
+    async def close(self):
+        await self._client.aclose()
@@ -1,11 +1,92 @@
 import os
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
 
-load_dotenv()
+# Parse .env once per process tree; set _DOTENV_LOADED=1 to skip it entirely
+# when the environment is injected by the orchestrator
+if not os.environ.get("_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["_DOTENV_LOADED"] = "1"
 
-PG_HOST = os.getenv("PG_HOST", "localhost")
-PG_PORT = int(os.getenv("PG_PORT", "5432"))
-PG_DATABASE = os.getenv("PG_DATABASE", "postgres")
-PG_USER = os.getenv("PG_USER", "postgres")
-PG_PASSWORD = os.getenv("PG_PASSWORD", "")
-PG_MAX_CONNECTIONS = int(os.getenv("PG_MAX_CONNECTIONS", "50"))
+@dataclass(frozen=True, slots=True)
+class Settings:
+    pg_host: str
+    pg_port: int
+    # Directory holding the server's .s.PGSQL.<pg_port> socket (e.g. /var/run/postgresql).
+    # When set it takes precedence over pg_host and skips TCP loopback for a
+    # co-located Postgres; a pg_host starting with "/" is treated the same way.
+    pg_unix_socket: str
+    pg_database: str
+    pg_user: str
+    pg_password: str
+    # Connection budgets shared by all web_concurrency workers
+    pg_max_connections: int
+    pg_min_connections: int
+    pg_max_inactive_lifetime: float
+    pg_max_queries: int
+    pg_statement_cache_size: int
+    # Largest SQL text (bytes) asyncpg keeps in its statement cache; raised
+    # from asyncpg's 15 KiB default so long multi-join queries are never re-parsed
+    pg_max_cacheable_statement_size: int
+    # Relations loaded into shared_buffers at startup (needs pg_prewarm)
+    pg_prewarm_relations: tuple
+    # Uvicorn worker processes sharing pg_max_connections (uvicorn reads the
+    # same WEB_CONCURRENCY variable as its --workers default)
+    web_concurrency: int
+    # Index of this worker when the process manager numbers them (e.g. supervisord
+    # %(process_num)d); used to pin the worker to a single core on Linux
+    worker_id: Optional[int]
+    # Seconds between background SELECT 1 probes of idle connections (0 disables).
+    # Pool connections are only probed when pg_max_inactive_lifetime is 0, since
+    # probing would keep them from ever going idle; dedicated ones always are.
+    pg_healthcheck_interval: float
+    # Seconds to establish a new connection / wait for a free pool connection / run a query
+    pg_connect_timeout: float
+    pg_acquire_timeout: float
+    pg_command_timeout: float
+    # Read replica for historical lookups; empty means everything uses the primary
+    pg_ro_host: str
+    pg_ro_port: int
+    pg_ro_min_connections: int
+    pg_ro_max_connections: int
+    # Connections per worker opened outside the asyncpg pool and handed out
+    # from a plain queue before falling back to the read pool (0 disables);
+    # they count against that pool's connection budget
+    pg_dedicated_connections: int
+    # Redis shared by the workers for hot response bodies; empty disables it
+    redis_url: str
+    # Seconds to connect to / wait on Redis before treating it as a miss
+    redis_timeout: float
+    # Seconds a token holders page stays in Redis (about a block's worth)
+    holders_cache_ttl: int
+
+settings = Settings(
+    pg_host=os.getenv("PG_HOST", "localhost"),
+    pg_port=int(os.getenv("PG_PORT", "5432")),
+    pg_unix_socket=os.getenv("PG_UNIX_SOCKET", ""),
+    pg_database=os.getenv("PG_DATABASE", "postgres"),
+    pg_user=os.getenv("PG_USER", "postgres"),
+    pg_password=os.getenv("PG_PASSWORD", ""),
+    pg_max_connections=int(os.getenv("PG_MAX_CONNECTIONS", "50")),
+    pg_min_connections=int(os.getenv("PG_MIN_CONNECTIONS", "10")),
+    pg_max_inactive_lifetime=float(os.getenv("PG_MAX_INACTIVE_LIFETIME", "300")),
+    pg_max_queries=int(os.getenv("PG_MAX_QUERIES", "50000")),
+    pg_statement_cache_size=int(os.getenv("PG_STATEMENT_CACHE_SIZE", "1024")),
+    pg_max_cacheable_statement_size=int(os.getenv("PG_MAX_CACHEABLE_STATEMENT_SIZE", str(64 * 1024))),
+    pg_prewarm_relations=tuple(rel.strip() for rel in os.getenv("PG_PREWARM_RELATIONS", "").split(",") if rel.strip()),
+    web_concurrency=int(os.getenv("WEB_CONCURRENCY", "1")),
+    worker_id=int(os.environ["WORKER_ID"]) if os.getenv("WORKER_ID") else None,
+    pg_healthcheck_interval=float(os.getenv("PG_HEALTHCHECK_INTERVAL", "30")),
+    pg_connect_timeout=float(os.getenv("PG_CONNECT_TIMEOUT", "5")),
+    pg_acquire_timeout=float(os.getenv("PG_ACQUIRE_TIMEOUT", "3")),
+    pg_command_timeout=float(os.getenv("PG_COMMAND_TIMEOUT", "60")),
+    pg_ro_host=os.getenv("PG_RO_HOST", ""),
+    pg_ro_port=int(os.getenv("PG_RO_PORT", os.getenv("PG_PORT", "5432"))),
+    pg_ro_min_connections=int(os.getenv("PG_RO_MIN_CONNECTIONS", os.getenv("PG_MIN_CONNECTIONS", "10"))),
+    pg_ro_max_connections=int(os.getenv("PG_RO_MAX_CONNECTIONS", os.getenv("PG_MAX_CONNECTIONS", "50"))),
+    pg_dedicated_connections=int(os.getenv("PG_DEDICATED_CONNECTIONS", "0")),
+    redis_url=os.getenv("REDIS_URL", ""),
+    redis_timeout=float(os.getenv("REDIS_TIMEOUT", "0.25")),
+    holders_cache_ttl=int(os.getenv("HOLDERS_CACHE_TTL", "15")),
+)
@@ -7,25 +7,36 @@ CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_blocks_number_desc ON blocks(number
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tx_block_number_desc ON transactions(block_number DESC, transaction_index DESC);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tx_from_address ON transactions(from_address);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tx_to_address ON transactions(to_address);
+-- Per-address history, newest first (from/to legs of the address listings)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tx_from_block_index ON transactions(from_address, block_number DESC, transaction_index DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tx_to_block_index ON transactions(to_address, block_number DESC, transaction_index DESC);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tx_hash ON transactions(hash);
 
 -- Logs: for token transfer lookups
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_tx_hash ON logs(transaction_hash);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_topic0 ON logs(topic0);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_address ON logs(address);
+-- First decoded event per transaction (LATERAL lookup in transaction lists)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_tx_hash_event ON logs(transaction_hash, log_index) WHERE event_name IS NOT NULL;
 
 -- ERC20 transfers
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc20_transfers_from ON erc20_transfers(from_address);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc20_transfers_to ON erc20_transfers(to_address);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc20_transfers_block ON erc20_transfers(block_number DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc20_transfers_from_block_log ON erc20_transfers(from_address, block_number DESC, log_index DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc20_transfers_to_block_log ON erc20_transfers(to_address, block_number DESC, log_index DESC);
 
 -- ERC721 transfers
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc721_transfers_from ON erc721_transfers(from_address);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc721_transfers_to ON erc721_transfers(to_address);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc721_transfers_block ON erc721_transfers(block_number DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc721_transfers_from_block_log ON erc721_transfers(from_address, block_number DESC, log_index DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc721_transfers_to_block_log ON erc721_transfers(to_address, block_number DESC, log_index DESC);
 
 -- Addresses
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_addresses_address ON addresses(address);
+-- Contracts list keyset order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_addresses_contracts_first_seen ON addresses(first_seen_block DESC, address DESC) WHERE is_contract = 1;
 
 -- ERC20 tokens
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc20_tokens_address ON erc20_tokens(address);
@@ -36,6 +47,9 @@ CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc721_tokens_address ON erc721_toke
 -- Contracts
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contracts_address ON contracts(address);
 
+-- Contract metadata: contracts of a protocol in name order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contract_metadata_protocol_name ON contract_metadata(protocol_id, contract_name);
+
 -- Analyze tables after creating indexes
 ANALYZE blocks;
 ANALYZE transactions;
@@ -46,3 +60,4 @@ ANALYZE addresses;
 ANALYZE erc20_tokens;
 ANALYZE erc721_tokens;
 ANALYZE contracts;
+ANALYZE contract_metadata;
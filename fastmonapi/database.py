@@ -1,29 +1,344 @@
+import asyncio
 import asyncpg
-from config import PG_HOST, PG_PORT, PG_DATABASE, PG_USER, PG_PASSWORD, PG_MAX_CONNECTIONS
-
-pool = None
-
-async def init_pool():
-    global pool
-    pool = await asyncpg.create_pool(
-        host=PG_HOST,
-        port=PG_PORT,
-        database=PG_DATABASE,
-        user=PG_USER,
-        password=PG_PASSWORD,
-        min_size=10,
-        max_size=PG_MAX_CONNECTIONS,
-        command_timeout=60
+import orjson
+from contextlib import asynccontextmanager
+from config import settings
+
+# Hottest lookups, prepared once per physical connection in _init_conn.
+# Columns are listed explicitly: asyncpg never re-prepares these statements, so
+# with SELECT * a column added to the table would make every pooled connection
+# fail with "cached plan must not change result type" until a restart.
+BLOCK_COLUMNS = (
+    "number, hash, parent_hash, nonce, sha3_uncles, logs_bloom, transactions_root, "
+    "state_root, receipts_root, miner, difficulty, total_difficulty, extra_data, size, "
+    "gas_limit, gas_used, timestamp, base_fee_per_gas, transaction_count, indexed_at"
+)
+ADDRESS_COLUMNS = (
+    "address, first_seen_block, first_seen_tx, is_contract, tx_count, balance, "
+    "last_updated_block, indexed_at"
+)
+CONTRACT_COLUMNS = (
+    "address, creator_address, creation_tx_hash, creation_block_number, bytecode, "
+    "is_erc20, is_erc721, is_erc1155, abi, verified, indexed_at"
+)
+
+LATEST_BLOCK_NUMBER_SQL = "SELECT MAX(number) FROM blocks"
+LATEST_BLOCKS_SQL = f"SELECT {BLOCK_COLUMNS} FROM blocks WHERE number > $1 ORDER BY number DESC LIMIT $2"
+BLOCK_BY_NUMBER_SQL = f"SELECT {BLOCK_COLUMNS} FROM blocks WHERE number = $1"
+BLOCK_BY_HASH_SQL = f"SELECT {BLOCK_COLUMNS} FROM blocks WHERE hash = $1"
+ADDRESS_SQL = f"SELECT {ADDRESS_COLUMNS} FROM addresses WHERE address = $1"
+CONTRACT_SQL = f"SELECT {CONTRACT_COLUMNS} FROM contracts WHERE address = $1"
+ERC20_TOKEN_SQL = "SELECT address, name, symbol, decimals, total_supply, indexed_at FROM erc20_tokens WHERE address = $1"
+ERC721_TOKEN_SQL = "SELECT address, name, symbol, total_supply, indexed_at FROM erc721_tokens WHERE address = $1"
+
+HOT_SQL = (
+    LATEST_BLOCK_NUMBER_SQL,
+    LATEST_BLOCKS_SQL,
+    BLOCK_BY_NUMBER_SQL,
+    BLOCK_BY_HASH_SQL,
+    ADDRESS_SQL,
+    CONTRACT_SQL,
+    ERC20_TOKEN_SQL,
+    ERC721_TOKEN_SQL,
+)
+
+class Connection(asyncpg.Connection):
+    # Keeps prepared statements alive for the life of the physical connection,
+    # reachable through pool proxies as `await conn.prepared(sql)`
+    __slots__ = ("_prepared",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prepared = {}
+
+    async def prepared(self, sql):
+        stmt = self._prepared.get(sql)
+        if stmt is None:
+            stmt = self._prepared[sql] = await self.prepare(sql)
+        return stmt
+
+async def _init_conn(conn):
+    # Codecs first: set_type_codec invalidates already prepared statements.
+    # Binary format skips the server's text conversion; jsonb's binary form is
+    # the JSON text prefixed with a version byte.
+    await conn.set_type_codec(
+        "json",
+        encoder=orjson.dumps,
+        decoder=orjson.loads,
+        schema="pg_catalog",
+        format="binary"
+    )
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=lambda value: b"\x01" + orjson.dumps(value),
+        decoder=lambda data: orjson.loads(data[1:]),
+        schema="pg_catalog",
+        format="binary"
+    )
+    # NUMERIC (token amounts, balances) is only ever rendered as a decimal
+    # string, so take the server's text form as-is instead of building a
+    # Decimal per value. int8 keeps its int decoding: block numbers are
+    # used in arithmetic.
+    await conn.set_type_codec(
+        "numeric",
+        encoder=str,
+        decoder=str,
+        schema="pg_catalog",
+        format="text"
+    )
+    for sql in HOT_SQL:
+        await conn.prepared(sql)
+
+async def _ping(pool, count):
+    # SELECT 1 on `count` connections at once; broken ones are terminated so
+    # the pool opens a fresh connection in their place. Acquires give up after
+    # pg_acquire_timeout, leaving busy slots to live requests.
+    acquired = await asyncio.gather(
+        *[pool.acquire(timeout=settings.pg_acquire_timeout) for _ in range(count)],
+        return_exceptions=True
+    )
+    conns = [conn for conn in acquired if not isinstance(conn, BaseException)]
+    try:
+        results = await asyncio.gather(*[conn.execute("SELECT 1") for conn in conns], return_exceptions=True)
+        for conn, result in zip(conns, results):
+            if isinstance(result, BaseException):
+                conn.terminate()
+    finally:
+        await asyncio.gather(*[pool.release(conn) for conn in conns])
+
+async def _reset(conn):
+    # The clean-up the pool runs on release (rollback, close cursors, unlisten);
+    # False when the connection can't be reused
+    try:
+        await conn.reset(timeout=settings.pg_acquire_timeout)
+    except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError):
+        return False
+    return True
+
+async def _warm_pool(pool):
+    # Round-trip every min_size connection once so the first burst of
+    # requests doesn't pay for cold backends
+    await _ping(pool, pool.get_min_size())
+
+async def _healthcheck(pool):
+    # Validate idle connections in the background rather than on every acquire.
+    # Only runs when idle culling is off: a ping acquires and releases the
+    # connection, which restarts its max_inactive_connection_lifetime timer.
+    while True:
+        await asyncio.sleep(settings.pg_healthcheck_interval)
+        idle = pool.get_idle_size()
+        if idle:
+            await _ping(pool, idle)
+
+async def _prewarm(pool, relations):
+    # Pull hot relations into shared_buffers so the first queries after a
+    # Postgres restart don't go to disk; one round trip for all relations,
+    # unknown ones are skipped, and it's a no-op if pg_prewarm isn't installed
+    async with pool.acquire() as conn:
+        try:
+            await conn.execute(
+                """
+                SELECT pg_prewarm(rel)
+                FROM (SELECT to_regclass(name) AS rel FROM unnest($1::text[]) name) r
+                WHERE rel IS NOT NULL
+                """,
+                list(relations)
+            )
+        except asyncpg.UndefinedFunctionError:
+            pass
+
+def _connect_kwargs(host, port):
+    return dict(
+        host=host,
+        port=port,
+        database=settings.pg_database,
+        user=settings.pg_user,
+        password=settings.pg_password,
+        timeout=settings.pg_connect_timeout,
+        command_timeout=settings.pg_command_timeout,
+        # Keep every query's prepared statement cached for the life of the
+        # connection, keyed by SQL text, whatever its length
+        statement_cache_size=settings.pg_statement_cache_size,
+        max_cached_statement_lifetime=0,
+        max_cacheable_statement_size=settings.pg_max_cacheable_statement_size,
+        # Short OLTP lookups only lose time to JIT compilation
+        server_settings={"jit": "off", "application_name": "fastmonapi"},
+        connection_class=Connection
     )
-    return pool
-
-async def close_pool():
-    global pool
-    if pool:
-        await pool.close()
-
-async def get_pool():
-    global pool
-    if pool is None:
-        await init_pool()
-    return pool
+
+async def _connect(host, port):
+    conn = await asyncpg.connect(**_connect_kwargs(host, port))
+    await _init_conn(conn)
+    return conn
+
+async def _create_pool(host, port, min_connections, max_connections, reserved=0):
+    # Both limits are budgets for all workers together: each worker gets its
+    # share, less the `reserved` connections it holds outside the pool
+    max_size = max(max_connections // settings.web_concurrency - reserved, 1)
+    min_size = min(max(min_connections // settings.web_concurrency, 1), max_size)
+    new_pool = await asyncpg.create_pool(
+        min_size=min_size,
+        max_size=max_size,
+        max_inactive_connection_lifetime=settings.pg_max_inactive_lifetime,
+        max_queries=settings.pg_max_queries,
+        init=_init_conn,
+        **_connect_kwargs(host, port)
+    )
+    # Warm connections and Postgres buffers at the same time
+    warmups = [_warm_pool(new_pool)]
+    if settings.pg_prewarm_relations:
+        warmups.append(_prewarm(new_pool, settings.pg_prewarm_relations))
+    await asyncio.gather(*warmups)
+    return new_pool
+
+class Database:
+    # One instance lives on app.state; pool_ro is the primary itself when no
+    # replica is configured
+    __slots__ = ("pool", "pool_ro", "_dedicated", "_dedicated_addr", "_reconnect_tasks", "_healthcheck_tasks", "_init_task")
+
+    def __init__(self):
+        self.pool = None
+        self.pool_ro = None
+        self._dedicated = asyncio.Queue()
+        self._dedicated_addr = None
+        self._reconnect_tasks = set()
+        self._healthcheck_tasks = []
+        self._init_task = None
+
+    async def init(self):
+        # Idempotent and lock-free: concurrent early callers await the same task
+        if self._init_task is None:
+            self._init_task = asyncio.create_task(self._create_pools())
+        await self._init_task
+
+    async def _create_pools(self):
+        # Dedicated connections go to the replica when there is one
+        dedicated = settings.pg_dedicated_connections
+        primary = _create_pool(
+            settings.pg_unix_socket or settings.pg_host,
+            settings.pg_port,
+            settings.pg_min_connections,
+            settings.pg_max_connections,
+            reserved=0 if settings.pg_ro_host else dedicated
+        )
+        if settings.pg_ro_host:
+            replica = _create_pool(
+                settings.pg_ro_host,
+                settings.pg_ro_port,
+                settings.pg_ro_min_connections,
+                settings.pg_ro_max_connections,
+                reserved=dedicated
+            )
+            self.pool, self.pool_ro = await asyncio.gather(primary, replica)
+        else:
+            self.pool = self.pool_ro = await primary
+
+        if dedicated > 0:
+            host, port = settings.pg_ro_host, settings.pg_ro_port
+            if not host:
+                host, port = settings.pg_unix_socket or settings.pg_host, settings.pg_port
+            self._dedicated_addr = (host, port)
+            conns = await asyncio.gather(*[_connect(host, port) for _ in range(dedicated)])
+            for conn in conns:
+                self._dedicated.put_nowait(conn)
+
+        if settings.pg_healthcheck_interval > 0:
+            # With PG_MAX_INACTIVE_LIFETIME set asyncpg already replaces idle
+            # pool connections; dedicated ones are never culled
+            if settings.pg_max_inactive_lifetime <= 0:
+                for pool in {self.pool, self.pool_ro}:
+                    self._healthcheck_tasks.append(asyncio.create_task(_healthcheck(pool)))
+            if dedicated > 0:
+                self._healthcheck_tasks.append(asyncio.create_task(self._healthcheck_dedicated()))
+
+    def _replace_dedicated(self, conn):
+        # Drop an unusable dedicated connection and open its replacement in the
+        # background, so the dedicated count doesn't shrink over time
+        conn.terminate()
+        task = asyncio.create_task(self._reconnect())
+        self._reconnect_tasks.add(task)
+        task.add_done_callback(self._reconnect_tasks.discard)
+
+    async def _reconnect(self):
+        try:
+            conn = await _connect(*self._dedicated_addr)
+        except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError):
+            # Postgres is unreachable; the pool absorbs the load meanwhile
+            return
+        self._dedicated.put_nowait(conn)
+
+    async def _healthcheck_dedicated(self):
+        # Same SELECT 1 probe as the pools get, for the idle dedicated connections
+        while True:
+            await asyncio.sleep(settings.pg_healthcheck_interval)
+            conns = []
+            while not self._dedicated.empty():
+                conns.append(self._dedicated.get_nowait())
+            try:
+                results = await asyncio.gather(*[conn.execute("SELECT 1") for conn in conns], return_exceptions=True)
+            except asyncio.CancelledError:
+                # Shutting down: these are out of the queue close() drains
+                for conn in conns:
+                    conn.terminate()
+                raise
+            for conn, result in zip(conns, results):
+                if isinstance(result, BaseException):
+                    self._replace_dedicated(conn)
+                else:
+                    self._dedicated.put_nowait(conn)
+
+    @asynccontextmanager
+    async def acquire(self, primary=False):
+        # Replica reads take an idle dedicated connection in a single queue
+        # operation; when none is free (or primary=True) the asyncpg pool handles it.
+        # A connection is only ever used by one request at a time.
+        if not primary:
+            try:
+                conn = self._dedicated.get_nowait()
+            except asyncio.QueueEmpty:
+                conn = None
+            if conn is not None:
+                clean = False
+                try:
+                    yield conn
+                    clean = not conn.is_in_transaction()
+                finally:
+                    # A failed or cancelled request (client gone, timeout) can
+                    # leave the connection mid-query or inside a transaction:
+                    # reset it like the pool would, and replace it if that fails
+                    try:
+                        if not clean and not conn.is_closed():
+                            clean = await _reset(conn)
+                    finally:
+                        if clean and not conn.is_closed():
+                            self._dedicated.put_nowait(conn)
+                        else:
+                            self._replace_dedicated(conn)
+                return
+
+        pool = self.pool if primary else self.pool_ro
+        async with pool.acquire(timeout=settings.pg_acquire_timeout) as conn:
+            yield conn
+
+    async def run(self, call, primary=False):
+        # `await call(conn)` on a connection held only for that call. Queries a
+        # request runs concurrently each go through run(), so a request never
+        # holds one connection while it waits for another: with the pool
+        # saturated, requests holding one and waiting on a second would all
+        # stall until pg_acquire_timeout.
+        async with self.acquire(primary) as conn:
+            return await call(conn)
+
+    async def close(self):
+        for task in self._healthcheck_tasks:
+            task.cancel()
+        self._healthcheck_tasks.clear()
+        for task in list(self._reconnect_tasks):
+            task.cancel()
+        await asyncio.gather(*self._reconnect_tasks, return_exceptions=True)
+        while not self._dedicated.empty():
+            await self._dedicated.get_nowait().close()
+        if self.pool_ro and self.pool_ro is not self.pool:
+            await self.pool_ro.close()
+        if self.pool:
+            await self.pool.close()
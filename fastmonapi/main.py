@@ -1,16 +1,150 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
-from database import init_pool, close_pool, get_pool
+from collections import OrderedDict
+from functools import lru_cache
+from database import (
+    Database,
+    LATEST_BLOCK_NUMBER_SQL, LATEST_BLOCKS_SQL, BLOCK_BY_NUMBER_SQL, BLOCK_BY_HASH_SQL,
+    ADDRESS_SQL, CONTRACT_SQL, ERC20_TOKEN_SQL, ERC721_TOKEN_SQL
+)
+from config import settings
+from cache import ResponseCache
 from typing import Optional
+import asyncio
+import asyncpg
+import logging
 import orjson
+import os
+import time
+
+log = logging.getLogger("api")
+
+def pin_worker_cpu():
+    # Keep this worker (and the asyncpg buffers it touches) on one core
+    if settings.worker_id is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {settings.worker_id % os.cpu_count()})
+
+# Seconds between reloads of the in-memory token metadata
+TOKEN_REFRESH_INTERVAL = 60
+
+# Stand-in for tokens the indexer hasn't stored metadata for (yet)
+NO_TOKEN = {"name": None, "symbol": None, "decimals": None, "total_supply": None}
+
+class TokenMetadata:
+    # erc20_tokens/erc721_tokens are small and near-static, so listings look
+    # token names up here instead of joining them into every row; entries can
+    # be up to TOKEN_REFRESH_INTERVAL seconds stale
+    __slots__ = ("erc20", "erc721")
+
+    def __init__(self):
+        self.erc20 = {}
+        self.erc721 = {}
+
+    async def load(self, db):
+        async with db.acquire() as conn:
+            erc20 = await conn.fetch("SELECT address, name, symbol, decimals, total_supply FROM erc20_tokens")
+            erc721 = await conn.fetch("SELECT address, name, symbol, total_supply FROM erc721_tokens")
+        self.erc20 = {row["address"]: row for row in erc20}
+        self.erc721 = {row["address"]: row for row in erc721}
+
+    # Single-token lookups for the token endpoints: the snapshot, else the
+    # table itself for tokens indexed since the last load (kept until the
+    # next load replaces the snapshot)
+    async def get_erc20(self, conn, address):
+        row = self.erc20.get(address)
+        if row is None:
+            row = await (await conn.prepared(ERC20_TOKEN_SQL)).fetchrow(address)
+            if row is not None:
+                self.erc20[address] = row
+        return row
+
+    async def get_erc721(self, conn, address):
+        row = self.erc721.get(address)
+        if row is None:
+            row = await (await conn.prepared(ERC721_TOKEN_SQL)).fetchrow(address)
+            if row is not None:
+                self.erc721[address] = row
+        return row
+
+    async def refresh(self, db):
+        while True:
+            await asyncio.sleep(TOKEN_REFRESH_INTERVAL)
+            try:
+                await self.load(db)
+            except Exception:
+                # Keep serving the previous snapshot until the next attempt;
+                # only cancellation (a BaseException) ends the loop
+                log.exception("token metadata refresh failed")
+
+# Seconds between rebuilds of the precomputed response bodies below
+SNAPSHOT_REFRESH_INTERVAL = 10
+
+class Snapshot:
+    # A response body that only changes at block cadence, rebuilt by a
+    # background task every SNAPSHOT_REFRESH_INTERVAL seconds and served as-is
+    # in between. Rebuilds are skipped while nobody asks for it, so an idle
+    # API doesn't keep re-running the query.
+    __slots__ = ("build", "body", "wanted", "_building")
+
+    def __init__(self, build):
+        self.build = build
+        self.body = None
+        self.wanted = True
+        self._building = None
+
+    def _rebuild(self, app):
+        # One build at a time: a cold start's concurrent requests and the
+        # refresh task all await the same one
+        if self._building is None:
+            self._building = asyncio.create_task(self.build(app))
+            self._building.add_done_callback(self._built)
+        return self._building
+
+    def _built(self, task):
+        self._building = None
+        if not task.cancelled() and task.exception() is None:
+            self.body = task.result()
+
+    async def get(self, app):
+        self.wanted = True
+        if self.body is None:
+            # Shielded so one cancelled request doesn't cancel the build for
+            # the others waiting on it
+            return await asyncio.shield(self._rebuild(app))
+        return self.body
+
+    async def refresh(self, app):
+        while True:
+            if self.wanted:
+                self.wanted = False
+                try:
+                    await self._rebuild(app)
+                except Exception:
+                    # Keep serving the previous body until the next attempt;
+                    # only cancellation (a BaseException) ends the loop
+                    log.exception("snapshot refresh failed")
+            await asyncio.sleep(SNAPSHOT_REFRESH_INTERVAL)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await init_pool()
+    pin_worker_cpu()
+    app.state.db = Database()
+    await app.state.db.init()
+    app.state.tokens = TokenMetadata()
+    await app.state.tokens.load(app.state.db)
+    refresh_tasks = [asyncio.create_task(app.state.tokens.refresh(app.state.db))]
+    refresh_tasks += [asyncio.create_task(snapshot.refresh(app)) for snapshot in (_stats_snapshot, _tokens_page_snapshot)]
+    app.state.cache = ResponseCache(settings.redis_url) if settings.redis_url else None
     yield
-    await close_pool()
+    for task in refresh_tasks:
+        task.cancel()
+    await asyncio.gather(*refresh_tasks, return_exceptions=True)
+    await _counts.close()
+    if app.state.cache:
+        await app.state.cache.close()
+    await app.state.db.close()
 
 app = FastAPI(
     title="Monad Indexer API",
@@ -18,6 +152,11 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+@app.exception_handler(asyncio.TimeoutError)
+async def timeout_handler(request: Request, exc: asyncio.TimeoutError):
+    # Pool exhausted or query too slow: fail fast so clients can retry
+    return ORJSONResponse(status_code=503, content={"detail": "Database busy, try again"})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,32 +165,244 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Helper to format block response
-def format_block(row):
-    return {
-        "number": str(row["number"]),
-        "hash": row["hash"],
-        "parentHash": row["parent_hash"],
-        "timestamp": str(row["timestamp"]),
-        "miner": row["miner"],
-        "gasLimit": str(row["gas_limit"]),
-        "gasUsed": str(row["gas_used"]),
-        "baseFeePerGas": row["base_fee_per_gas"] or "0",
-        "difficulty": row["difficulty"] or "0",
-        "totalDifficulty": row["total_difficulty"] or "0",
-        "transactionCount": row["transaction_count"],
-        "nonce": row["nonce"],
-        "sha3Uncles": row["sha3_uncles"],
-        "logsBloom": row["logs_bloom"],
-        "transactionsRoot": row["transactions_root"],
-        "stateRoot": row["state_root"],
-        "receiptsRoot": row["receipts_root"],
-        "extraData": row["extra_data"],
-        "size": row["size"]
-    }
+class RawJSONResponse(Response):
+    # Body is already orjson-encoded bytes; nothing left to render
+    media_type = "application/json"
+
+    def render(self, content):
+        return content
+
+# orjson handles datetime and UUID natively; NUMERIC columns already arrive as
+# str through the connection codec
+def dump_json(payload):
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+# Serialize straight to bytes; returning a Response skips FastAPI's
+# jsonable_encoder pass over the payload
+def json_response(payload):
+    return RawJSONResponse(dump_json(payload))
+
+# Rows serialized per chunk of a streamed list body
+STREAM_CHUNK_ROWS = 25
+
+async def _stream_list(rows, formatter, extra):
+    # {"data":[...], **extra} emitted chunk by chunk, so only a slice of the
+    # formatted rows is ever alive and the first bytes leave before the last
+    # row is formatted
+    yield b'{"data":['
+    for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+        chunk = b",".join([dump_json(formatter(row)) for row in rows[start:start + STREAM_CHUNK_ROWS]])
+        yield chunk if start == 0 else b"," + chunk
+    yield b"]," + dump_json(extra)[1:] if extra else b"]}"
+
+def stream_list_response(rows, formatter, **extra):
+    return StreamingResponse(_stream_list(rows, formatter, extra), media_type="application/json")
+
+# Pagination totals below this planner estimate are counted exactly
+EXACT_COUNT_LIMIT = 10000
+
+async def count_rows(conn, sql, *args):
+    # Ask the planner for its row estimate instead of running COUNT(*) over a
+    # large filtered set; small sets still get an exact count
+    plan = await conn.fetchval("EXPLAIN (FORMAT JSON) " + sql, *args)
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    if estimate > EXACT_COUNT_LIMIT:
+        return estimate
+    return await conn.fetchval(f"SELECT COUNT(*) FROM ({sql}) sub", *args)
+
+# Approximate row count of a relation: the statistics collector's n_live_tup,
+# which follows inserts as they commit, or pg_class.reltuples from the last
+# ANALYZE when the collector's counters were reset
+TABLE_ROWS_SQL = """
+    SELECT GREATEST(s.n_live_tup, c.reltuples::bigint, 0)
+    FROM pg_class c
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE c.oid = {}::regclass
+"""
+
+async def table_rows_estimate(conn, table):
+    return await (await conn.prepared(TABLE_ROWS_SQL.format("$1::text"))).fetchval(table) or 0
+
+STATS_SQL = f"""
+    SELECT
+        (SELECT MAX(number) FROM blocks) as latest_block,
+        ({TABLE_ROWS_SQL.format("'transactions'")}) as total_transactions,
+        ({TABLE_ROWS_SQL.format("'contracts'")}) as total_contracts
+"""
+
+# Seconds an exact pagination total is served before it is recounted
+COUNT_TTL = 30
+
+class CountCache:
+    # Exact COUNT(*) results keyed by (sql, args). Concurrent first requests
+    # for a key share one COUNT, and an expired total keeps being served while
+    # one background task recounts it, so only the first requests for a key
+    # ever wait on the COUNT
+    __slots__ = ("maxsize", "_data", "_pending")
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._pending = {}
+
+    async def _count(self, db, key):
+        sql, args = key
+        async with db.acquire() as conn:
+            total = await conn.fetchval(sql, *args)
+        self._data[key] = (time.monotonic() + COUNT_TTL, total)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return total
+
+    async def _refresh(self, db, key):
+        try:
+            await self._count(db, key)
+        except (asyncpg.PostgresError, OSError, asyncio.TimeoutError):
+            # Keep serving the expired total; the next request retries
+            pass
+
+    def _start(self, key, coro):
+        task = self._pending[key] = asyncio.create_task(coro)
+        task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return task
+
+    async def get(self, db, sql, *args):
+        key = (sql, args)
+        entry = self._data.get(key)
+        if entry is None:
+            task = self._pending.get(key) or self._start(key, self._count(db, key))
+            # Shielded so one cancelled request doesn't cancel the COUNT for
+            # the others waiting on it
+            return await asyncio.shield(task)
+        self._data.move_to_end(key)
+        expires, total = entry
+        if expires < time.monotonic() and key not in self._pending:
+            self._start(key, self._refresh(db, key))
+        return total
+
+    async def close(self):
+        tasks = list(self._pending.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+_counts = CountCache(4096)
+
+# Listing endpoints page by keyset cursor (after_block/after_index, the sort key
+# of the last row returned); `page` is kept for old clients, costs O(offset),
+# and is ignored once a cursor is given
+DEPRECATED_PAGE = Query(1, ge=1, deprecated=True)
+
+def check_cursor(*parts):
+    if any(part is None for part in parts) and any(part is not None for part in parts):
+        raise HTTPException(status_code=400, detail="Incomplete pagination cursor")
+    return parts[0] is not None
+
+def next_cursor(rows, limit, **fields):
+    # Cursor for the page after `rows`; fields map query params to row columns
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return {param: last[column] for param, column in fields.items()}
+
+def address_legs(table, order, keyset):
+    # Rows of `table` sent or received by $1, as two legs that each walk a
+    # (from_address|to_address, <order>) index and stop after $2 + $3 rows,
+    # instead of a bitmap OR over the whole history. Self-transfers come from
+    # the first leg only. Callers still ORDER BY/LIMIT $2 OFFSET $3 the union.
+    return "\nUNION ALL\n".join(
+        f"(SELECT * FROM {table} WHERE {match} {keyset} ORDER BY {order} LIMIT $2::bigint + $3::bigint)"
+        for match in ("from_address = $1", "to_address = $1 AND from_address <> $1")
+    )
+
+# Timestamp of transfer row et as text. block_timestamp is denormalized by
+# migrations/add_transfer_block_timestamp.sql but stays NULL for rows not yet
+# backfilled, or inserted before their block; those fall back to blocks.
+TRANSFER_TIMESTAMP_SQL = "COALESCE(et.block_timestamp, (SELECT b.timestamp FROM blocks b WHERE b.number = et.block_number))::text"
+
+# Blocks this deep below the tip are treated as final and never change
+BLOCK_FINALITY_DEPTH = 32
+
+class BytesLRU:
+    # Bounded map of pre-serialized responses; one payload may be stored under
+    # several keys (e.g. block number and block hash)
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, keys, value):
+        for key in keys:
+            self._data[key] = value
+            self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+# Full /api/blocks/{block_id} bodies keyed by number and hash, and the header-only
+# /api/blocks/hash/{block_hash} bodies keyed by hash
+_block_cache = BytesLRU(2048)
+_block_header_cache = BytesLRU(2048)
+
+def _block_cache_key(block_id):
+    return block_id if block_id.startswith("0x") else int(block_id)
+
+# Row formatters compiled per result shape: each (response key, column,
+# expression) becomes a positional r[i] access in a generated function, so
+# building the dict does no per-column name lookups
+@lru_cache(maxsize=None)
+def row_formatter(fields, columns):
+    index = {column: i for i, column in enumerate(columns)}
+    items = ", ".join(
+        f"{key!r}: {expr.format(f'r[{index[column]}]')}" for key, column, expr in fields
+    )
+    namespace = {}
+    exec(f"def fmt(r): return {{{items}}}", namespace)
+    return namespace["fmt"]
+
+def statement_formatter(fields, stmt):
+    return row_formatter(fields, tuple(attr.name for attr in stmt.get_attributes()))
+
+# Block response shape, for rows of the blocks table
+BLOCK_FIELDS = (
+    ("number", "number", "str({})"),
+    ("hash", "hash", "{}"),
+    ("parentHash", "parent_hash", "{}"),
+    ("timestamp", "timestamp", "str({})"),
+    ("miner", "miner", "{}"),
+    ("gasLimit", "gas_limit", "str({})"),
+    ("gasUsed", "gas_used", "str({})"),
+    ("baseFeePerGas", "base_fee_per_gas", "{} or '0'"),
+    ("difficulty", "difficulty", "{} or '0'"),
+    ("totalDifficulty", "total_difficulty", "{} or '0'"),
+    ("transactionCount", "transaction_count", "{}"),
+    ("nonce", "nonce", "{}"),
+    ("sha3Uncles", "sha3_uncles", "{}"),
+    ("logsBloom", "logs_bloom", "{}"),
+    ("transactionsRoot", "transactions_root", "{}"),
+    ("stateRoot", "state_root", "{}"),
+    ("receiptsRoot", "receipts_root", "{}"),
+    ("extraData", "extra_data", "{}"),
+    ("size", "size", "{}"),
+)
 
-# Helper to format transaction response
-def format_transaction(row):
+# Transaction columns included (camelCased) only when non-empty
+OPTIONAL_TX_FIELDS = {
+    "gas_price": "gasPrice",
+    "max_fee_per_gas": "maxFeePerGas",
+    "max_priority_fee_per_gas": "maxPriorityFeePerGas",
+    "effective_gas_price": "effectiveGasPrice",
+}
+SIGNATURE_TX_FIELDS = {"v": "v", "r": "r", "s": "s"}
+
+# Helper to format a transaction in a list: everything but the calldata and
+# signature, which can be many KB per row and are only shown on the detail page
+def format_transaction_brief(row):
     tx = {
         "hash": row["hash"],
         "from": row["from_address"],
@@ -64,28 +415,14 @@ def format_transaction(row):
         "timestamp": str(row["timestamp"]) if "timestamp" in row.keys() else "0",
         "transactionIndex": row["transaction_index"],
         "nonce": row["nonce"],
-        "input": row["input"],
         "status": row["status"] == 1 if row["status"] is not None else None,
         "type": row["type"],
         "chainId": row["chain_id"],
     }
 
-    if row.get("gas_price"):
-        tx["gasPrice"] = row["gas_price"]
-    if row.get("max_fee_per_gas"):
-        tx["maxFeePerGas"] = row["max_fee_per_gas"]
-    if row.get("max_priority_fee_per_gas"):
-        tx["maxPriorityFeePerGas"] = row["max_priority_fee_per_gas"]
-    if row.get("effective_gas_price"):
-        tx["effectiveGasPrice"] = row["effective_gas_price"]
+    tx.update({key: row[column] for column, key in OPTIONAL_TX_FIELDS.items() if row.get(column)})
     if row.get("cumulative_gas_used"):
         tx["cumulativeGasUsed"] = str(row["cumulative_gas_used"])
-    if row.get("v"):
-        tx["v"] = row["v"]
-    if row.get("r"):
-        tx["r"] = row["r"]
-    if row.get("s"):
-        tx["s"] = row["s"]
 
     # Extract method ID from input
     if row["input"] and len(row["input"]) >= 10:
@@ -97,6 +434,123 @@ def format_transaction(row):
 
     return tx
 
+# Helper to format the transaction detail response
+def format_transaction_full(row):
+    tx = format_transaction_brief(row)
+    tx["input"] = row["input"]
+    tx.update({key: row[column] for column, key in SIGNATURE_TX_FIELDS.items() if row.get(column)})
+    return tx
+
+# keccak256("Transfer(address,address,uint256)")
+ERC20_TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+# uint256 hex word h (64 digits) to a decimal string, folded from eight
+# 32-bit chunks with exact numeric arithmetic
+UINT256_FROM_HEX_SQL = "::numeric".join([
+    "(" * 7 + "('x' || lpad(substr(h, 1, 8), 16, '0'))::bit(64)::bigint",
+    *[f" * 4294967296 + ('x' || lpad(substr(h, {8 * i + 1}, 8), 16, '0'))::bit(64)::bigint)" for i in range(1, 8)],
+]) + "::text"
+
+# Logs and decoded Transfer events of transaction t as JSON
+# arrays built in Postgres; $2 is ERC20_TRANSFER_TOPIC. decodedParams comes
+# back as the raw text and is parsed by decode_log_params(), so malformed
+# rows fall back to the string instead of failing the whole query.
+ENRICHED_LOGS_SQL = f"""
+    (
+        SELECT COALESCE(jsonb_agg(jsonb_build_object(
+            'logIndex', l.log_index,
+            'address', l.address,
+            'topics', to_jsonb(array_remove(array_remove(ARRAY[l.topic0, l.topic1, l.topic2, l.topic3], NULL), '')),
+            'data', COALESCE(NULLIF(l.data, ''), '0x'),
+            'blockNumber', l.block_number::text,
+            'transactionHash', l.transaction_hash,
+            'eventName', l.event_name,
+            'eventSignature', l.event_signature,
+            'decodedParams', NULLIF(l.decoded_params, '')
+        ) ORDER BY l.log_index), '[]')::text
+        FROM logs l
+        WHERE l.transaction_hash = t.hash
+    ) AS logs_json,
+    (
+        SELECT COALESCE(jsonb_agg(jsonb_build_object(
+            'from', '0x' || substring(l.topic1 from 27),
+            'to', '0x' || substring(l.topic2 from 27),
+            'value', COALESCE(v.value, '0'),
+            'tokenAddress', l.address,
+            'token', jsonb_build_object(
+                'address', l.address,
+                'name', COALESCE(NULLIF(e.name, ''), 'Unknown'),
+                'symbol', COALESCE(NULLIF(e.symbol, ''), '???'),
+                'decimals', COALESCE(NULLIF(e.decimals, 0), 18)
+            )
+        ) ORDER BY l.log_index), '[]')::text
+        FROM logs l
+        LEFT JOIN erc20_tokens e ON l.address = e.address
+        -- Transfer's data is its one non-indexed uint256, i.e. exactly one
+        -- 32-byte word (64 hex digits). Longer, non-standard data is cut to
+        -- its first 64 digits by lpad, where int(data, 16) used all of it.
+        CROSS JOIN LATERAL (
+            SELECT {UINT256_FROM_HEX_SQL} AS value
+            FROM lpad(substring(l.data from 3), 64, '0') h
+        ) v
+        WHERE l.transaction_hash = t.hash
+          AND l.topic0 = $2
+          AND length(l.topic1) = 66 AND length(l.topic2) = 66
+    ) AS erc20_transfers_json
+"""
+
+# Parse each log's decoded_params text in logs_json; unparseable text is
+# passed through as is
+def decode_log_params(logs_json):
+    logs = orjson.loads(logs_json)
+    for log in logs:
+        decoded_params = log["decodedParams"]
+        if decoded_params:
+            try:
+                log["decodedParams"] = orjson.loads(decoded_params)
+            except orjson.JSONDecodeError:
+                pass
+    return logs
+
+# /api/transactions/{tx_hash}?enriched=true in one round trip
+ENRICHED_TRANSACTION_SQL = f"""
+    SELECT t.*, b.timestamp, {ENRICHED_LOGS_SQL}
+    FROM transactions t
+    JOIN blocks b ON t.block_number = b.number
+    WHERE t.hash = $1
+"""
+
+# format_transaction_brief() as a SQL expression, so Postgres can emit transaction
+# JSON directly; expects the transaction as t, its block as b and the first
+# decoded event as fe.event_name. Optional keys are omitted when empty, as in
+# format_transaction_brief().
+TRANSACTION_JSON = """
+    jsonb_build_object(
+        'hash', t.hash,
+        'from', t.from_address,
+        'to', t.to_address,
+        'value', t.value,
+        'gas', t.gas::text,
+        'gasUsed', COALESCE(t.gas_used, 0)::text,
+        'blockNumber', t.block_number::text,
+        'blockHash', t.block_hash,
+        'timestamp', b.timestamp::text,
+        'transactionIndex', t.transaction_index,
+        'nonce', t.nonce,
+        'status', t.status = 1,
+        'type', t.type,
+        'chainId', t.chain_id
+    ) || jsonb_strip_nulls(jsonb_build_object(
+        'gasPrice', NULLIF(t.gas_price, ''),
+        'maxFeePerGas', NULLIF(t.max_fee_per_gas, ''),
+        'maxPriorityFeePerGas', NULLIF(t.max_priority_fee_per_gas, ''),
+        'effectiveGasPrice', NULLIF(t.effective_gas_price, ''),
+        'cumulativeGasUsed', NULLIF(t.cumulative_gas_used, 0)::text,
+        'methodId', CASE WHEN length(t.input) >= 10 THEN left(t.input, 10) END,
+        'eventName', NULLIF(fe.event_name, '')
+    ))
+"""
+
 # Helper to format address response
 def format_address(row):
     return {
@@ -111,6 +565,28 @@ def format_address(row):
         "contractCreationTx": None
     }
 
+# Helper to format a /api/addresses/contracts/list row
+def format_contract_list_row(row):
+    addr = format_address(row)
+    addr["contractCode"] = row["bytecode"]
+    addr["contractCreator"] = row["creator_address"]
+    addr["contractCreationTx"] = row["creation_tx_hash"]
+
+    # Add metadata if available
+    if row["contract_name"] or row["nickname"]:
+        addr["contractName"] = row["contract_name"]
+        addr["nickname"] = row["nickname"]
+        addr["notes"] = row["notes"]
+
+    if row["protocol_name"]:
+        addr["protocol"] = {
+            "name": row["protocol_name"],
+            "logoUrl": row["protocol_logo_url"],
+            "website": row["protocol_website"]
+        }
+
+    return addr
+
 # Helper to format protocol response
 def format_protocol(row):
     return {
@@ -128,6 +604,57 @@ def format_protocol(row):
         "indexedAt": str(row["indexed_at"]) if row["indexed_at"] else None
     }
 
+# Transfers of one token (/api/tokens/{address}/transfers); the token itself is
+# reported once next to the list. The query selects only the columns held in
+# the covering (token_address, block_number, log_index) indexes.
+def format_erc20_token_transfer(row):
+    return {
+        "from": row["from_address"],
+        "to": row["to_address"],
+        "value": row["value"],
+        "transactionHash": row["transaction_hash"],
+        "blockNumber": str(row["block_number"]),
+        "timestamp": row["timestamp"],
+        "logIndex": row["log_index"]
+    }
+
+def format_erc721_token_transfer(row):
+    return {
+        "from": row["from_address"],
+        "to": row["to_address"],
+        "tokenId": row["token_id"],
+        "transactionHash": row["transaction_hash"],
+        "blockNumber": str(row["block_number"]),
+        "timestamp": row["timestamp"],
+        "logIndex": row["log_index"]
+    }
+
+# Contract of a protocol, with its ERC20 details when it is a token;
+# creation_block_number is selected as text
+def format_protocol_contract(contract):
+    contract_info = {
+        "address": contract["address"],
+        "contractName": contract["contract_name"],
+        "nickname": contract["nickname"],
+        "notes": contract["notes"],
+        "creatorAddress": contract["creator_address"],
+        "creationTxHash": contract["creation_tx_hash"],
+        "creationBlockNumber": contract["creation_block_number"],
+        "isErc20": contract["is_erc20"],
+        "isErc721": contract["is_erc721"],
+        "isErc1155": contract["is_erc1155"],
+        "verified": contract["verified"]
+    }
+
+    if contract["token_name"] or contract["token_symbol"]:
+        contract_info["tokenInfo"] = {
+            "name": contract["token_name"],
+            "symbol": contract["token_symbol"],
+            "decimals": contract["token_decimals"]
+        }
+
+    return contract_info
+
 # Helper to format contract metadata response
 def format_contract_metadata(row):
     result = {
@@ -158,86 +685,103 @@ def format_contract_metadata(row):
 
     return result
 
+# Handlers read through db.acquire(), i.e. the replica when PG_RO_HOST is set,
+# except the chain-tip endpoints, which use the primary (primary=True) so they
+# never lag behind the indexer.
+
 # ===== BLOCKS ENDPOINTS =====
 
 @app.get("/api/blocks/latest")
-async def get_latest_blocks(limit: int = Query(10, ge=1, le=100)):
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+async def get_latest_blocks(request: Request, limit: int = Query(10, ge=1, le=100)):
+    db = request.app.state.db
+    async with db.acquire(primary=True) as conn:
         # Get max block number first (fast - uses primary key)
-        max_block = await conn.fetchval("SELECT MAX(number) FROM blocks")
+        max_block = await (await conn.prepared(LATEST_BLOCK_NUMBER_SQL)).fetchval()
         if max_block is None:
-            return {"data": [], "count": 0}
+            return json_response({"data": [], "count": 0})
 
         # Fetch blocks by primary key range (much faster than ORDER BY)
-        rows = await conn.fetch(
-            "SELECT * FROM blocks WHERE number > $1 ORDER BY number DESC LIMIT $2",
-            max_block - limit - 10, limit
-        )
+        stmt = await conn.prepared(LATEST_BLOCKS_SQL)
+        rows = await stmt.fetch(max_block - limit - 10, limit)
 
+    format_block = statement_formatter(BLOCK_FIELDS, stmt)
     blocks = [format_block(row) for row in rows]
-    return {"data": blocks, "count": max_block}
+    return json_response({"data": blocks, "count": max_block})
 
 @app.get("/api/blocks/{block_id}")
-async def get_block(block_id: str):
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        # Check if it's a number or hash
-        if block_id.startswith("0x"):
-            row = await conn.fetchrow(
-                "SELECT * FROM blocks WHERE hash = $1",
-                block_id
-            )
-        else:
-            row = await conn.fetchrow(
-                "SELECT * FROM blocks WHERE number = $1",
-                int(block_id)
-            )
-
-    if not row:
-        raise HTTPException(status_code=404, detail="Block not found")
-
-    block = format_block(row)
+async def get_block(request: Request, block_id: str):
+    cached = _block_cache.get(_block_cache_key(block_id))
+    if cached is not None:
+        return RawJSONResponse(cached)
 
-    # Fetch transactions for this block with event names
-    async with pool.acquire() as conn:
-        tx_rows = await conn.fetch(
-            """
-            SELECT t.*, $2::bigint as timestamp,
-                   (SELECT l.event_name FROM logs l
-                    WHERE l.transaction_hash = t.hash AND l.event_name IS NOT NULL
-                    ORDER BY l.log_index LIMIT 1) as first_event_name
-            FROM transactions t
-            WHERE t.block_number = $1
-            ORDER BY t.transaction_index ASC
-            LIMIT 100
+    if block_id.startswith("0x"):
+        block_sql, block_filter, block_key = BLOCK_BY_HASH_SQL, "(SELECT number FROM blocks WHERE hash = $1)", block_id
+    else:
+        block_sql, block_filter, block_key = BLOCK_BY_NUMBER_SQL, "$1", int(block_id)
+
+    async def fetch_block(conn):
+        stmt = await conn.prepared(block_sql)
+        row = await stmt.fetchrow(block_key)
+        max_block = await (await conn.prepared(LATEST_BLOCK_NUMBER_SQL)).fetchval()
+        return stmt, row, max_block
+
+    # Block header and its transactions (with event names) concurrently, each
+    # on a connection of its own; the transaction query resolves the block itself
+    db = request.app.state.db
+    (stmt, row, max_block), transactions_json = await asyncio.gather(
+        db.run(fetch_block),
+        db.run(lambda conn: conn.fetchval(
+            f"""
+            SELECT COALESCE(jsonb_agg({TRANSACTION_JSON} ORDER BY t.transaction_index), '[]')::text
+            FROM (
+                SELECT * FROM transactions
+                WHERE block_number = {block_filter}
+                ORDER BY transaction_index ASC
+                LIMIT 100
+            ) t
+            JOIN blocks b ON b.number = t.block_number
+            LEFT JOIN LATERAL (
+                SELECT l.event_name FROM logs l
+                WHERE l.transaction_hash = t.hash AND l.event_name IS NOT NULL
+                ORDER BY l.log_index LIMIT 1
+            ) fe ON TRUE
             """,
-            row["number"], row["timestamp"]
-        )
+            block_key
+        ))
+    )
 
-    block["transactions"] = [format_transaction(tx) for tx in tx_rows]
+    if not row:
+        raise HTTPException(status_code=404, detail="Block not found")
 
-    return block
+    # Splice the server-built transaction array into the serialized header
+    block = dump_json(statement_formatter(BLOCK_FIELDS, stmt)(row))
+    payload = block[:-1] + b',"transactions":' + transactions_json.encode() + b"}"
+    if max_block - row["number"] > BLOCK_FINALITY_DEPTH:
+        _block_cache.put((row["number"], row["hash"]), payload)
+    return RawJSONResponse(payload)
 
 @app.get("/api/blocks/{block_id}/transactions")
 async def get_block_transactions(
+    request: Request,
     block_id: str,
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    page: int = DEPRECATED_PAGE,
+    limit: int = Query(20, ge=1, le=100),
+    after_index: Optional[int] = None
 ):
-    offset = (page - 1) * limit
-    pool = await get_pool()
+    keyset = check_cursor(after_index)
+    offset = 0 if keyset else (page - 1) * limit
+    db = request.app.state.db
 
-    # Get block number
-    async with pool.acquire() as conn:
+    # Get block number, timestamp and the transaction total in one lookup
+    async with db.acquire() as conn:
         if block_id.startswith("0x"):
             block_row = await conn.fetchrow(
-                "SELECT number, timestamp FROM blocks WHERE hash = $1",
+                "SELECT number, timestamp, transaction_count FROM blocks WHERE hash = $1",
                 block_id
             )
         else:
             block_row = await conn.fetchrow(
-                "SELECT number, timestamp FROM blocks WHERE number = $1",
+                "SELECT number, timestamp, transaction_count FROM blocks WHERE number = $1",
                 int(block_id)
             )
 
@@ -248,72 +792,81 @@ async def get_block_transactions(
         block_timestamp = block_row["timestamp"]
 
         rows = await conn.fetch(
-            """
+            f"""
             SELECT t.*, $2::bigint as timestamp
             FROM transactions t
             WHERE t.block_number = $1
+            {"AND t.transaction_index > $5" if keyset else ""}
             ORDER BY t.transaction_index ASC
             LIMIT $3 OFFSET $4
             """,
-            block_number, block_timestamp, limit, offset
-        )
-
-        count_row = await conn.fetchrow(
-            "SELECT transaction_count FROM blocks WHERE number = $1",
-            block_number
+            block_number, block_timestamp, limit, offset, *((after_index,) if keyset else ())
         )
 
-    transactions = [format_transaction(row) for row in rows]
-    total = count_row["transaction_count"] if count_row else 0
+    transactions = [format_transaction_brief(row) for row in rows]
+    total = block_row["transaction_count"] or 0
 
-    return {
+    return json_response({
         "data": transactions,
         "pagination": {
             "page": page,
             "limit": limit,
             "total": total,
-            "totalPages": (total + limit - 1) // limit
+            "totalPages": (total + limit - 1) // limit,
+            "nextCursor": next_cursor(rows, limit, after_index="transaction_index")
         }
-    }
+    })
 
 @app.get("/api/blocks/hash/{block_hash}")
-async def get_block_by_hash(block_hash: str):
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT * FROM blocks WHERE hash = $1",
-            block_hash
-        )
+async def get_block_by_hash(request: Request, block_hash: str):
+    cached = _block_header_cache.get(block_hash)
+    if cached is not None:
+        return RawJSONResponse(cached)
+
+    db = request.app.state.db
+    async with db.acquire() as conn:
+        stmt = await conn.prepared(BLOCK_BY_HASH_SQL)
+        row = await stmt.fetchrow(block_hash)
+        max_block = await (await conn.prepared(LATEST_BLOCK_NUMBER_SQL)).fetchval()
 
     if not row:
         raise HTTPException(status_code=404, detail="Block not found")
 
-    return format_block(row)
+    payload = dump_json(statement_formatter(BLOCK_FIELDS, stmt)(row))
+    if max_block - row["number"] > BLOCK_FINALITY_DEPTH:
+        _block_header_cache.put((block_hash,), payload)
+    return RawJSONResponse(payload)
 
 # ===== TRANSACTIONS ENDPOINTS =====
 
 @app.get("/api/transactions/latest")
-async def get_latest_transactions(limit: int = Query(10, ge=1, le=100)):
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+async def get_latest_transactions(request: Request, limit: int = Query(10, ge=1, le=100)):
+    db = request.app.state.db
+    async with db.acquire(primary=True) as conn:
         # Get max block number first (fast)
-        max_block = await conn.fetchval("SELECT MAX(number) FROM blocks")
+        max_block = await (await conn.prepared(LATEST_BLOCK_NUMBER_SQL)).fetchval()
         if max_block is None:
-            return {"data": [], "count": 0}
+            return json_response({"data": [], "count": 0})
 
         # Fetch transactions from recent blocks only (much faster)
         # Include first event name from logs for each transaction
         rows = await conn.fetch(
             """
-            SELECT t.*, b.timestamp,
-                   (SELECT l.event_name FROM logs l
-                    WHERE l.transaction_hash = t.hash AND l.event_name IS NOT NULL
-                    ORDER BY l.log_index LIMIT 1) as first_event_name
-            FROM transactions t
-            JOIN blocks b ON t.block_number = b.number
-            WHERE t.block_number > $1
+            SELECT t.*, fe.event_name as first_event_name
+            FROM (
+                SELECT t.*, b.timestamp
+                FROM transactions t
+                JOIN blocks b ON t.block_number = b.number
+                WHERE t.block_number > $1
+                ORDER BY t.block_number DESC, t.transaction_index DESC
+                LIMIT $2
+            ) t
+            LEFT JOIN LATERAL (
+                SELECT l.event_name FROM logs l
+                WHERE l.transaction_hash = t.hash AND l.event_name IS NOT NULL
+                ORDER BY l.log_index LIMIT 1
+            ) fe ON TRUE
             ORDER BY t.block_number DESC, t.transaction_index DESC
-            LIMIT $2
             """,
             max_block - 100, limit
         )
@@ -324,27 +877,30 @@ async def get_latest_transactions(limit: int = Query(10, ge=1, le=100)):
             max_block - 10000
         )
 
-    transactions = [format_transaction(row) for row in rows]
-    return {"data": transactions, "count": estimated_count or 0}
+    return stream_list_response(rows, format_transaction_brief, count=estimated_count or 0)
 
 @app.get("/api/transactions/{tx_hash}")
-async def get_transaction(tx_hash: str, enriched: bool = Query(False)):
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT t.*, b.timestamp
-            FROM transactions t
-            JOIN blocks b ON t.block_number = b.number
-            WHERE t.hash = $1
-            """,
-            tx_hash
-        )
+async def get_transaction(request: Request, tx_hash: str, enriched: bool = Query(False)):
+    db = request.app.state.db
+    async with db.acquire() as conn:
+        # Enriched logs come back in the same round trip, already JSON-encoded
+        if enriched:
+            row = await conn.fetchrow(ENRICHED_TRANSACTION_SQL, tx_hash, ERC20_TRANSFER_TOPIC)
+        else:
+            row = await conn.fetchrow(
+                """
+                SELECT t.*, b.timestamp
+                FROM transactions t
+                JOIN blocks b ON t.block_number = b.number
+                WHERE t.hash = $1
+                """,
+                tx_hash
+            )
 
     if not row:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    tx = format_transaction(row)
+    tx = format_transaction_full(row)
 
     if enriched:
         # Add enriched fields
@@ -353,64 +909,6 @@ async def get_transaction(tx_hash: str, enriched: bool = Query(False)):
             "defaultView": row["input"] or "0x"
         }
 
-        # Get logs for token transfers
-        async with pool.acquire() as conn:
-            logs = await conn.fetch(
-                """
-                SELECT l.*, e.symbol, e.name, e.decimals
-                FROM logs l
-                LEFT JOIN erc20_tokens e ON l.address = e.address
-                WHERE l.transaction_hash = $1
-                ORDER BY l.log_index
-                """,
-                tx_hash
-            )
-
-        erc20_transfers = []
-        all_logs = []
-
-        for log in logs:
-            # Format log for response
-            formatted_log = {
-                "logIndex": log["log_index"],
-                "address": log["address"],
-                "topics": [t for t in [log["topic0"], log["topic1"], log["topic2"], log["topic3"]] if t],
-                "data": log["data"] or "0x",
-                "blockNumber": str(log["block_number"]),
-                "transactionHash": log["transaction_hash"],
-                "eventName": log["event_name"],
-                "eventSignature": log["event_signature"],
-                "decodedParams": None
-            }
-
-            # Parse decoded_params JSON if available
-            if log["decoded_params"]:
-                try:
-                    import json
-                    formatted_log["decodedParams"] = json.loads(log["decoded_params"])
-                except:
-                    formatted_log["decodedParams"] = log["decoded_params"]
-
-            all_logs.append(formatted_log)
-
-            # ERC20 Transfer event signature
-            if log["topic0"] == "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef":
-                if log["topic1"] and log["topic2"] and len(log["topic1"]) == 66 and len(log["topic2"]) == 66:
-                    erc20_transfers.append({
-                        "from": "0x" + log["topic1"][26:],
-                        "to": "0x" + log["topic2"][26:],
-                        "value": str(int(log["data"], 16)) if log["data"] and log["data"] != "0x" else "0",
-                        "tokenAddress": log["address"],
-                        "token": {
-                            "address": log["address"],
-                            "name": log["name"] or "Unknown",
-                            "symbol": log["symbol"] or "???",
-                            "decimals": log["decimals"] or 18
-                        }
-                    })
-
-        tx["logs"] = all_logs
-        tx["erc20TokensTransferred"] = erc20_transfers
         tx["erc721TokensTransferred"] = []
         tx["erc1155TokensTransferred"] = []
 
@@ -424,29 +922,35 @@ async def get_transaction(tx_hash: str, enriched: bool = Query(False)):
                 gas_price_int = int(gas_price)
             tx["transactionFee"] = str(int(tx["gasUsed"]) * gas_price_int)
 
-    return tx
+        # Splice the server-built arrays into the serialized transaction
+        return RawJSONResponse(
+            dump_json(tx)[:-1]
+            + b',"logs":' + dump_json(decode_log_params(row["logs_json"]))
+            + b',"erc20TokensTransferred":' + row["erc20_transfers_json"].encode()
+            + b"}"
+        )
+
+    return json_response(tx)
 
 # ===== ADDRESSES ENDPOINTS =====
 
 @app.get("/api/addresses/{address}")
-async def get_address(address: str):
+async def get_address(request: Request, address: str):
     address = address.lower()
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT * FROM addresses WHERE address = $1",
-            address
-        )
+    db = request.app.state.db
+    # Check if it's a contract - always query contracts table to handle data sync issues.
+    # Both lookups run concurrently, each on a connection of its own.
+    async def fetch_row(sql, conn):
+        return await (await conn.prepared(sql)).fetchrow(address)
 
-        # Check if it's a contract - always query contracts table to handle data sync issues
-        contract_row = await conn.fetchrow(
-            "SELECT * FROM contracts WHERE address = $1",
-            address
-        )
+    row, contract_row = await asyncio.gather(
+        db.run(lambda conn: fetch_row(ADDRESS_SQL, conn)),
+        db.run(lambda conn: fetch_row(CONTRACT_SQL, conn))
+    )
 
     if not row:
         # Return default for unknown address
-        return {
+        return json_response({
             "address": address,
             "balance": "0",
             "transactionCount": 0,
@@ -456,7 +960,7 @@ async def get_address(address: str):
             "contractCode": None,
             "contractCreator": None,
             "contractCreationTx": None
-        }
+        })
 
     result = format_address(row)
 
@@ -466,58 +970,64 @@ async def get_address(address: str):
         result["contractCreator"] = contract_row["creator_address"]
         result["contractCreationTx"] = contract_row["creation_tx_hash"]
 
-    return result
+    return json_response(result)
 
 @app.get("/api/addresses/{address}/transactions")
 async def get_address_transactions(
+    request: Request,
     address: str,
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    page: int = DEPRECATED_PAGE,
+    limit: int = Query(20, ge=1, le=100),
+    after_block: Optional[int] = None,
+    after_index: Optional[int] = None
 ):
     address = address.lower()
-    offset = (page - 1) * limit
+    keyset = check_cursor(after_block, after_index)
+    offset = 0 if keyset else (page - 1) * limit
 
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    db = request.app.state.db
+    async with db.acquire() as conn:
         rows = await conn.fetch(
-            """
-            SELECT t.*, b.timestamp,
-                   (SELECT l.event_name FROM logs l
-                    WHERE l.transaction_hash = t.hash AND l.event_name IS NOT NULL
-                    ORDER BY l.log_index LIMIT 1) as first_event_name
-            FROM transactions t
-            JOIN blocks b ON t.block_number = b.number
-            WHERE t.from_address = $1 OR t.to_address = $1
+            f"""
+            SELECT t.*, fe.event_name as first_event_name
+            FROM (
+                SELECT t.*, b.timestamp
+                FROM ({address_legs(
+                    "transactions",
+                    "block_number DESC, transaction_index DESC",
+                    "AND (block_number, transaction_index) < ($4, $5)" if keyset else ""
+                )}) t
+                JOIN blocks b ON t.block_number = b.number
+                ORDER BY t.block_number DESC, t.transaction_index DESC
+                LIMIT $2 OFFSET $3
+            ) t
+            LEFT JOIN LATERAL (
+                SELECT l.event_name FROM logs l
+                WHERE l.transaction_hash = t.hash AND l.event_name IS NOT NULL
+                ORDER BY l.log_index LIMIT 1
+            ) fe ON TRUE
             ORDER BY t.block_number DESC, t.transaction_index DESC
-            LIMIT $2 OFFSET $3
             """,
-            address, limit, offset
+            address, limit, offset, *((after_block, after_index) if keyset else ())
         )
 
-        count_row = await conn.fetchrow(
-            """
-            SELECT COUNT(*) as total
-            FROM transactions
-            WHERE from_address = $1 OR to_address = $1
-            """,
+        # The indexer already maintains the per-address transaction count
+        total = await conn.fetchval(
+            "SELECT tx_count FROM addresses WHERE address = $1",
             address
-        )
+        ) or 0
 
-    transactions = [format_transaction(row) for row in rows]
-    total = count_row["total"]
-
-    return {
-        "data": transactions,
-        "pagination": {
-            "page": page,
-            "limit": limit,
-            "total": total,
-            "totalPages": (total + limit - 1) // limit
-        }
-    }
+    return stream_list_response(rows, format_transaction_brief, pagination={
+        "page": page,
+        "limit": limit,
+        "total": total,
+        "totalPages": (total + limit - 1) // limit,
+        "nextCursor": next_cursor(rows, limit, after_block="block_number", after_index="transaction_index")
+    })
 
 @app.get("/api/addresses/{address}/token-balances")
 async def get_address_token_balances(
+    request: Request,
     address: str,
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100)
@@ -525,58 +1035,47 @@ async def get_address_token_balances(
     address = address.lower()
     offset = (page - 1) * limit
 
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        # Calculate token balances from transfers
+    db = request.app.state.db
+    async with db.acquire() as conn:
+        # Balances are maintained per transfer by migrations/add_token_balances.sql
         rows = await conn.fetch(
             """
-            WITH balances AS (
-                SELECT
-                    token_address,
-                    SUM(CASE WHEN to_address = $1 THEN CAST(value AS NUMERIC) ELSE 0 END) -
-                    SUM(CASE WHEN from_address = $1 THEN CAST(value AS NUMERIC) ELSE 0 END) as balance
-                FROM erc20_transfers
-                WHERE from_address = $1 OR to_address = $1
-                GROUP BY token_address
-                HAVING SUM(CASE WHEN to_address = $1 THEN CAST(value AS NUMERIC) ELSE 0 END) -
-                       SUM(CASE WHEN from_address = $1 THEN CAST(value AS NUMERIC) ELSE 0 END) > 0
-            )
-            SELECT b.token_address, b.balance, t.name, t.symbol, t.decimals, t.total_supply
-            FROM balances b
-            LEFT JOIN erc20_tokens t ON b.token_address = t.address
-            ORDER BY b.balance DESC
+            SELECT token_address, balance
+            FROM token_balances
+            WHERE address = $1 AND balance > 0
+            ORDER BY balance DESC
             LIMIT $2 OFFSET $3
             """,
             address, limit, offset
         )
 
         count_row = await conn.fetchrow(
-            """
-            SELECT COUNT(DISTINCT token_address) as total
-            FROM erc20_transfers
-            WHERE from_address = $1 OR to_address = $1
-            """,
+            "SELECT COUNT(*) as total FROM token_balances WHERE address = $1 AND balance > 0",
             address
         )
 
-    balances = []
-    for row in rows:
-        balances.append({
+    erc20 = request.app.state.tokens.erc20
+    # `for token in [...]` binds the row's token inside the comprehension
+    balances = [
+        {
             "tokenAddress": row["token_address"],
             "holderAddress": address,
-            "balance": str(int(row["balance"])),
+            "balance": row["balance"],
             "token": {
                 "address": row["token_address"],
-                "name": row["name"] or "Unknown",
-                "symbol": row["symbol"] or "???",
-                "decimals": row["decimals"] or 18,
-                "totalSupply": row["total_supply"] or "0"
+                "name": token["name"] or "Unknown",
+                "symbol": token["symbol"] or "???",
+                "decimals": token["decimals"] or 18,
+                "totalSupply": token["total_supply"] or "0"
             }
-        })
+        }
+        for row in rows
+        for token in [erc20.get(row["token_address"], NO_TOKEN)]
+    ]
 
     total = count_row["total"]
 
-    return {
+    return json_response({
         "data": balances,
         "pagination": {
             "page": page,
@@ -584,71 +1083,75 @@ async def get_address_token_balances(
             "total": total,
             "totalPages": (total + limit - 1) // limit
         }
-    }
+    })
 
 @app.get("/api/addresses/{address}/token-transfers")
 async def get_address_token_transfers(
+    request: Request,
     address: str,
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    page: int = DEPRECATED_PAGE,
+    limit: int = Query(20, ge=1, le=100),
+    after_block: Optional[int] = None,
+    after_index: Optional[int] = None
 ):
     address = address.lower()
-    offset = (page - 1) * limit
+    keyset = check_cursor(after_block, after_index)
+    offset = 0 if keyset else (page - 1) * limit
 
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    db = request.app.state.db
+    async with db.acquire() as conn:
         rows = await conn.fetch(
-            """
-            SELECT et.*, t.name, t.symbol, t.decimals, b.timestamp
-            FROM erc20_transfers et
-            LEFT JOIN erc20_tokens t ON et.token_address = t.address
-            JOIN blocks b ON et.block_number = b.number
-            WHERE et.from_address = $1 OR et.to_address = $1
+            f"""
+            SELECT et.*, {TRANSFER_TIMESTAMP_SQL} as timestamp
+            FROM ({address_legs(
+                "erc20_transfers",
+                "block_number DESC, log_index DESC",
+                "AND (block_number, log_index) < ($4, $5)" if keyset else ""
+            )}) et
             ORDER BY et.block_number DESC, et.log_index DESC
             LIMIT $2 OFFSET $3
             """,
-            address, limit, offset
+            address, limit, offset, *((after_block, after_index) if keyset else ())
         )
 
-        count_row = await conn.fetchrow(
-            """
-            SELECT COUNT(*) as total
-            FROM erc20_transfers
-            WHERE from_address = $1 OR to_address = $1
-            """,
+        total = await count_rows(
+            conn,
+            "SELECT 1 FROM erc20_transfers WHERE from_address = $1 OR to_address = $1",
             address
         )
 
-    transfers = []
-    for row in rows:
-        transfers.append({
+    erc20 = request.app.state.tokens.erc20
+    transfers = [
+        {
             "from": row["from_address"],
             "to": row["to_address"],
             "value": row["value"],
             "tokenAddress": row["token_address"],
             "transactionHash": row["transaction_hash"],
             "blockNumber": str(row["block_number"]),
-            "timestamp": str(row["timestamp"]),
+            "timestamp": row["timestamp"],
             "logIndex": row["log_index"],
             "token": {
                 "address": row["token_address"],
-                "name": row["name"] or "Unknown",
-                "symbol": row["symbol"] or "???",
-                "decimals": row["decimals"] or 18
+                "name": token["name"] or "Unknown",
+                "symbol": token["symbol"] or "???",
+                "decimals": token["decimals"] or 18
             }
-        })
-
-    total = count_row["total"]
+        }
+        for row in rows
+        for token in [erc20.get(row["token_address"], NO_TOKEN)]
+    ]
 
-    return {
+    return json_response({
         "data": transfers,
         "pagination": {
             "page": page,
             "limit": limit,
             "total": total,
-            "totalPages": (total + limit - 1) // limit
+            "totalPages": (total + limit - 1) // limit,
+            "nextCursor": next_cursor(rows, limit, after_block="block_number", after_index="log_index")
         }
-    }
+    })
 
 @app.get("/api/addresses/{address}/internal-transactions")
 async def get_address_internal_transactions(
@@ -657,7 +1160,7 @@ async def get_address_internal_transactions(
     limit: int = Query(20, ge=1, le=100)
 ):
     # Internal transactions not tracked in current schema
-    return {
+    return json_response({
         "data": [],
         "pagination": {
             "page": page,
@@ -665,10 +1168,11 @@ async def get_address_internal_transactions(
             "total": 0,
             "totalPages": 0
         }
-    }
+    })
 
 @app.get("/api/addresses/{address}/nfts")
 async def get_address_nfts(
+    request: Request,
     address: str,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
@@ -677,62 +1181,44 @@ async def get_address_nfts(
     address = address.lower()
     offset = (page - 1) * limit
 
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        # Calculate NFT ownership from transfers
+    db = request.app.state.db
+    async with db.acquire() as conn:
+        # Current owners are maintained per transfer by migrations/add_token_balances.sql
         rows = await conn.fetch(
             """
-            WITH ownership AS (
-                SELECT
-                    token_address,
-                    token_id,
-                    SUM(CASE WHEN to_address = $1 THEN 1 ELSE 0 END) -
-                    SUM(CASE WHEN from_address = $1 THEN 1 ELSE 0 END) as owned
-                FROM erc721_transfers
-                WHERE from_address = $1 OR to_address = $1
-                GROUP BY token_address, token_id
-                HAVING SUM(CASE WHEN to_address = $1 THEN 1 ELSE 0 END) -
-                       SUM(CASE WHEN from_address = $1 THEN 1 ELSE 0 END) > 0
-            )
-            SELECT o.token_address, o.token_id, t.name, t.symbol
-            FROM ownership o
-            LEFT JOIN erc721_tokens t ON o.token_address = t.address
-            ORDER BY o.token_address, o.token_id
+            SELECT token_address, token_id
+            FROM nft_ownership
+            WHERE owner = $1
+            ORDER BY token_address, token_id
             LIMIT $2 OFFSET $3
             """,
             address, limit, offset
         )
 
         count_row = await conn.fetchrow(
-            """
-            SELECT COUNT(*) as total FROM (
-                SELECT token_address, token_id
-                FROM erc721_transfers
-                WHERE from_address = $1 OR to_address = $1
-                GROUP BY token_address, token_id
-                HAVING SUM(CASE WHEN to_address = $1 THEN 1 ELSE 0 END) -
-                       SUM(CASE WHEN from_address = $1 THEN 1 ELSE 0 END) > 0
-            ) sub
-            """,
+            "SELECT COUNT(*) as total FROM nft_ownership WHERE owner = $1",
             address
         )
 
-    nfts = []
-    for row in rows:
-        nfts.append({
+    erc721 = request.app.state.tokens.erc721
+    nfts = [
+        {
             "collectionAddress": row["token_address"],
             "tokenId": row["token_id"],
             "owner": address,
             "collection": {
-                "name": row["name"] or "Unknown",
-                "symbol": row["symbol"] or "???",
+                "name": token["name"] or "Unknown",
+                "symbol": token["symbol"] or "???",
                 "tokenType": "ERC721"
             }
-        })
+        }
+        for row in rows
+        for token in [erc721.get(row["token_address"], NO_TOKEN)]
+    ]
 
     total = count_row["total"]
 
-    return {
+    return json_response({
         "data": nfts,
         "pagination": {
             "page": page,
@@ -740,44 +1226,46 @@ async def get_address_nfts(
             "total": total,
             "totalPages": (total + limit - 1) // limit
         }
-    }
+    })
 
 @app.get("/api/addresses/{address}/nft-transfers")
 async def get_address_nft_transfers(
+    request: Request,
     address: str,
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    page: int = DEPRECATED_PAGE,
+    limit: int = Query(20, ge=1, le=100),
+    after_block: Optional[int] = None,
+    after_index: Optional[int] = None
 ):
     address = address.lower()
-    offset = (page - 1) * limit
+    keyset = check_cursor(after_block, after_index)
+    offset = 0 if keyset else (page - 1) * limit
 
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    db = request.app.state.db
+    async with db.acquire() as conn:
         rows = await conn.fetch(
-            """
-            SELECT et.*, t.name, t.symbol, b.timestamp
-            FROM erc721_transfers et
-            LEFT JOIN erc721_tokens t ON et.token_address = t.address
-            JOIN blocks b ON et.block_number = b.number
-            WHERE et.from_address = $1 OR et.to_address = $1
+            f"""
+            SELECT et.*, {TRANSFER_TIMESTAMP_SQL} as timestamp
+            FROM ({address_legs(
+                "erc721_transfers",
+                "block_number DESC, log_index DESC",
+                "AND (block_number, log_index) < ($4, $5)" if keyset else ""
+            )}) et
             ORDER BY et.block_number DESC, et.log_index DESC
             LIMIT $2 OFFSET $3
             """,
-            address, limit, offset
+            address, limit, offset, *((after_block, after_index) if keyset else ())
         )
 
-        count_row = await conn.fetchrow(
-            """
-            SELECT COUNT(*) as total
-            FROM erc721_transfers
-            WHERE from_address = $1 OR to_address = $1
-            """,
+        total = await count_rows(
+            conn,
+            "SELECT 1 FROM erc721_transfers WHERE from_address = $1 OR to_address = $1",
             address
         )
 
-    transfers = []
-    for row in rows:
-        transfers.append({
+    erc721 = request.app.state.tokens.erc721
+    transfers = [
+        {
             "collectionAddress": row["token_address"],
             "tokenId": row["token_id"],
             "from": row["from_address"],
@@ -786,37 +1274,43 @@ async def get_address_nft_transfers(
             "tokenType": "ERC721",
             "transactionHash": row["transaction_hash"],
             "blockNumber": str(row["block_number"]),
-            "timestamp": str(row["timestamp"]),
+            "timestamp": row["timestamp"],
             "collection": {
-                "name": row["name"] or "Unknown",
-                "symbol": row["symbol"] or "???",
+                "name": token["name"] or "Unknown",
+                "symbol": token["symbol"] or "???",
                 "tokenType": "ERC721"
             }
-        })
-
-    total = count_row["total"]
+        }
+        for row in rows
+        for token in [erc721.get(row["token_address"], NO_TOKEN)]
+    ]
 
-    return {
+    return json_response({
         "data": transfers,
         "pagination": {
             "page": page,
             "limit": limit,
             "total": total,
-            "totalPages": (total + limit - 1) // limit
+            "totalPages": (total + limit - 1) // limit,
+            "nextCursor": next_cursor(rows, limit, after_block="block_number", after_index="log_index")
         }
-    }
+    })
 
 @app.get("/api/addresses/contracts/list")
 async def get_contracts_list(
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    request: Request,
+    page: int = DEPRECATED_PAGE,
+    limit: int = Query(20, ge=1, le=100),
+    after_block: Optional[int] = None,
+    after_address: Optional[str] = None
 ):
-    offset = (page - 1) * limit
+    keyset = check_cursor(after_block, after_address)
+    offset = 0 if keyset else (page - 1) * limit
 
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    db = request.app.state.db
+    async with db.acquire() as conn:
         rows = await conn.fetch(
-            """
+            f"""
             SELECT a.*, c.creator_address, c.creation_tx_hash, c.bytecode,
                    cm.contract_name, cm.nickname, cm.notes,
                    p.name as protocol_name, p.logo_url as protocol_logo_url, p.website as protocol_website
@@ -825,175 +1319,132 @@ async def get_contracts_list(
             LEFT JOIN contract_metadata cm ON a.address = cm.address
             LEFT JOIN protocols p ON cm.protocol_id = p.id
             WHERE a.is_contract = 1
-            ORDER BY a.first_seen_block DESC
+            {"AND (a.first_seen_block, a.address) < ($3, $4)" if keyset else ""}
+            ORDER BY a.first_seen_block DESC, a.address DESC
             LIMIT $1 OFFSET $2
             """,
-            limit, offset
+            limit, offset, *((after_block, after_address.lower()) if keyset else ())
         )
 
-        count_row = await conn.fetchrow(
-            "SELECT COUNT(*) as total FROM contracts"
-        )
+        total = await table_rows_estimate(conn, "contracts")
 
-    contracts = []
-    for row in rows:
-        addr = format_address(row)
-        addr["contractCode"] = row["bytecode"]
-        addr["contractCreator"] = row["creator_address"]
-        addr["contractCreationTx"] = row["creation_tx_hash"]
+    return stream_list_response(rows, format_contract_list_row, pagination={
+        "page": page,
+        "limit": limit,
+        "total": total,
+        "totalPages": (total + limit - 1) // limit,
+        "nextCursor": next_cursor(rows, limit, after_block="first_seen_block", after_address="address")
+    })
 
-        # Add metadata if available
-        if row["contract_name"] or row["nickname"]:
-            addr["contractName"] = row["contract_name"]
-            addr["nickname"] = row["nickname"]
-            addr["notes"] = row["notes"]
+# ===== METADATA ENDPOINT =====
 
+# Everything that can name an address, each a primary-key probe, in one round
+# trip; the is_* flags tell which tables matched
+ADDRESS_METADATA_SQL = """
+    SELECT
+        e20.address IS NOT NULL as is_erc20,
+        e20.name as erc20_name,
+        e20.symbol as erc20_symbol,
+        e20.decimals as erc20_decimals,
+        e721.address IS NOT NULL as is_erc721,
+        e721.name as erc721_name,
+        e721.symbol as erc721_symbol,
+        c.address IS NOT NULL as is_contract,
+        cm.address IS NOT NULL as has_metadata,
+        cm.contract_name,
+        cm.nickname,
+        cm.notes,
+        p.name as protocol_name,
+        p.logo_url as protocol_logo_url,
+        p.website as protocol_website
+    FROM (SELECT $1::text as address) a
+    LEFT JOIN erc20_tokens e20 ON e20.address = a.address
+    LEFT JOIN erc721_tokens e721 ON e721.address = a.address
+    LEFT JOIN contracts c ON c.address = a.address
+    LEFT JOIN contract_metadata cm ON cm.address = a.address
+    LEFT JOIN protocols p ON p.id = cm.protocol_id
+"""
+
+def _apply_contract_meta(result, row, notes=False):
+    # Overlay the contract_metadata/protocol columns of ADDRESS_METADATA_SQL
+    if row["has_metadata"]:
+        result["contractName"] = row["contract_name"]
+        result["nickname"] = row["nickname"]
+        if notes:
+            result["notes"] = row["notes"]
         if row["protocol_name"]:
-            addr["protocol"] = {
+            result["protocol"] = {
                 "name": row["protocol_name"],
                 "logoUrl": row["protocol_logo_url"],
                 "website": row["protocol_website"]
             }
-
-        contracts.append(addr)
-
-    total = count_row["total"]
-
-    return {
-        "data": contracts,
-        "pagination": {
-            "page": page,
-            "limit": limit,
-            "total": total,
-            "totalPages": (total + limit - 1) // limit
-        }
-    }
-
-# ===== METADATA ENDPOINT =====
+    return result
 
 @app.get("/api/metadata/address/{address}")
-async def get_address_metadata(address: str):
+async def get_address_metadata(request: Request, address: str):
     address = address.lower()
 
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        # First check for contract metadata (protocol info)
-        contract_meta = await conn.fetchrow(
-            """
-            SELECT cm.*, p.name as protocol_name, p.logo_url as protocol_logo_url,
-                   p.website as protocol_website
-            FROM contract_metadata cm
-            LEFT JOIN protocols p ON cm.protocol_id = p.id
-            WHERE cm.address = $1
-            """,
-            address
-        )
-
-        # Check if it's an ERC20 token
-        erc20 = await conn.fetchrow(
-            "SELECT * FROM erc20_tokens WHERE address = $1",
-            address
-        )
-
-        if erc20:
-            result = {
-                "address": address,
-                "name": erc20["name"] or "Unknown Token",
-                "label": erc20["symbol"] or "???",
-                "symbol": erc20["symbol"],
-                "isToken": True,
-                "tokenStandard": "ERC20",
-                "decimals": erc20["decimals"] or 18
-            }
+    db = request.app.state.db
+    async with db.acquire() as conn:
+        row = await (await conn.prepared(ADDRESS_METADATA_SQL)).fetchrow(address)
 
-            # Add protocol info if available
-            if contract_meta:
-                result["contractName"] = contract_meta["contract_name"]
-                result["nickname"] = contract_meta["nickname"]
-                if contract_meta["protocol_name"]:
-                    result["protocol"] = {
-                        "name": contract_meta["protocol_name"],
-                        "logoUrl": contract_meta["protocol_logo_url"],
-                        "website": contract_meta["protocol_website"]
-                    }
-
-            return result
-
-        # Check if it's an ERC721 token
-        erc721 = await conn.fetchrow(
-            "SELECT * FROM erc721_tokens WHERE address = $1",
-            address
-        )
-
-        if erc721:
-            result = {
-                "address": address,
-                "name": erc721["name"] or "Unknown NFT",
-                "label": erc721["symbol"] or "NFT",
-                "symbol": erc721["symbol"],
-                "isToken": True,
-                "tokenStandard": "ERC721"
-            }
-
-            # Add protocol info if available
-            if contract_meta:
-                result["contractName"] = contract_meta["contract_name"]
-                result["nickname"] = contract_meta["nickname"]
-                if contract_meta["protocol_name"]:
-                    result["protocol"] = {
-                        "name": contract_meta["protocol_name"],
-                        "logoUrl": contract_meta["protocol_logo_url"],
-                        "website": contract_meta["protocol_website"]
-                    }
-
-            return result
-
-        # Check if it's a contract
-        contract = await conn.fetchrow(
-            "SELECT * FROM contracts WHERE address = $1",
-            address
-        )
-
-        if contract:
-            result = {
-                "address": address,
-                "name": "Contract",
-                "label": "Contract",
-                "entityType": "Contract"
-            }
-
-            # Add protocol info if available
-            if contract_meta:
-                result["name"] = contract_meta["contract_name"] or contract_meta["nickname"] or "Contract"
-                result["label"] = contract_meta["nickname"] or contract_meta["contract_name"] or "Contract"
-                result["contractName"] = contract_meta["contract_name"]
-                result["nickname"] = contract_meta["nickname"]
-                result["notes"] = contract_meta["notes"]
-                if contract_meta["protocol_name"]:
-                    result["protocol"] = {
-                        "name": contract_meta["protocol_name"],
-                        "logoUrl": contract_meta["protocol_logo_url"],
-                        "website": contract_meta["protocol_website"]
-                    }
-
-            return result
+    if row["is_erc20"]:
+        return json_response(_apply_contract_meta({
+            "address": address,
+            "name": row["erc20_name"] or "Unknown Token",
+            "label": row["erc20_symbol"] or "???",
+            "symbol": row["erc20_symbol"],
+            "isToken": True,
+            "tokenStandard": "ERC20",
+            "decimals": row["erc20_decimals"] or 18
+        }, row))
+
+    if row["is_erc721"]:
+        return json_response(_apply_contract_meta({
+            "address": address,
+            "name": row["erc721_name"] or "Unknown NFT",
+            "label": row["erc721_symbol"] or "NFT",
+            "symbol": row["erc721_symbol"],
+            "isToken": True,
+            "tokenStandard": "ERC721"
+        }, row))
+
+    if row["is_contract"]:
+        # Plain contracts are named after their metadata when there is some
+        result = {
+            "address": address,
+            "name": row["contract_name"] or row["nickname"] or "Contract",
+            "label": row["nickname"] or row["contract_name"] or "Contract",
+            "entityType": "Contract"
+        }
+        return json_response(_apply_contract_meta(result, row, notes=True))
 
     # Not found - return 404
     raise HTTPException(status_code=404, detail="Metadata not found")
 
 # ===== TOKEN ENDPOINTS =====
 
+# Page served from _tokens_page_snapshot
+TOKENS_DEFAULT_LIMIT = 20
+
 @app.get("/api/tokens")
 async def get_tokens_list(
+    request: Request,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(TOKENS_DEFAULT_LIMIT, ge=1, le=100)
 ):
+    if page == 1 and limit == TOKENS_DEFAULT_LIMIT:
+        return RawJSONResponse(await _tokens_page_snapshot.get(request.app))
+    return RawJSONResponse(await build_tokens_page(request.app, page, limit))
+
+async def build_tokens_page(app, page, limit):
     offset = (page - 1) * limit
-    pool = await get_pool()
+    db = app.state.db
 
-    async with pool.acquire() as conn:
-        # Get all ERC20 tokens with stats
-        rows = await conn.fetch(
+    # All ERC20 tokens with stats; the total comes from the count cache (its
+    # own connection on a miss) while the page is fetched
+    rows, total = await asyncio.gather(
+        db.run(lambda conn: conn.fetch(
             """
             SELECT
                 t.address,
@@ -1001,30 +1452,32 @@ async def get_tokens_list(
                 t.symbol,
                 t.decimals,
                 t.total_supply,
-                COALESCE(s.holder_count, 0) as holder_count,
+                COALESCE(h.holder_count, 0) as holder_count,
                 COALESCE(s.transfer_count, 0) as transfer_count
             FROM erc20_tokens t
             LEFT JOIN (
-                SELECT
-                    token_address,
-                    COUNT(DISTINCT CASE WHEN to_address != '0x0000000000000000000000000000000000000000' THEN to_address END) as holder_count,
-                    COUNT(*) as transfer_count
+                SELECT token_address, COUNT(*) as transfer_count
                 FROM erc20_transfers
                 GROUP BY token_address
             ) s ON t.address = s.token_address
+            LEFT JOIN (
+                -- Current holders, as in get_token, instead of a
+                -- COUNT(DISTINCT) over every transfer's recipient
+                SELECT token_address, COUNT(*) as holder_count
+                FROM token_balances
+                WHERE balance > 0
+                GROUP BY token_address
+            ) h ON t.address = h.token_address
             ORDER BY s.transfer_count DESC NULLS LAST, t.address
             LIMIT $1 OFFSET $2
             """,
             limit, offset
-        )
-
-        count_row = await conn.fetchrow(
-            "SELECT COUNT(*) as total FROM erc20_tokens"
-        )
+        )),
+        _counts.get(db, "SELECT COUNT(*) FROM erc20_tokens")
+    )
 
-    tokens = []
-    for row in rows:
-        tokens.append({
+    tokens = [
+        {
             "address": row["address"],
             "name": row["name"] or "Unknown Token",
             "symbol": row["symbol"] or "???",
@@ -1033,11 +1486,11 @@ async def get_tokens_list(
             "tokenType": "ERC20",
             "holderCount": row["holder_count"],
             "transferCount": row["transfer_count"]
-        })
-
-    total = count_row["total"] if count_row else 0
+        }
+        for row in rows
+    ]
 
-    return {
+    return dump_json({
         "data": tokens,
         "pagination": {
             "page": page,
@@ -1045,39 +1498,27 @@ async def get_tokens_list(
             "total": total,
             "totalPages": (total + limit - 1) // limit
         }
-    }
+    })
+
+_tokens_page_snapshot = Snapshot(lambda app: build_tokens_page(app, 1, TOKENS_DEFAULT_LIMIT))
 
 @app.get("/api/tokens/{address}")
-async def get_token(address: str):
+async def get_token(request: Request, address: str):
     address = address.lower()
-    pool = await get_pool()
+    db = request.app.state.db
 
-    async with pool.acquire() as conn:
+    async with db.acquire() as conn:
         # Check ERC20 first
-        erc20 = await conn.fetchrow(
-            "SELECT * FROM erc20_tokens WHERE address = $1",
-            address
-        )
+        erc20 = await request.app.state.tokens.get_erc20(conn, address)
 
         if erc20:
-            # Get holder count (addresses with positive balance) and transfer count
+            # Get holder count (addresses with positive balance, from the
+            # maintained token_balances table) and transfer count
             stats = await conn.fetchrow(
                 """
                 SELECT
-                    (SELECT COUNT(*) FROM (
-                        SELECT addr
-                        FROM (
-                            SELECT to_address as addr, CAST(value AS NUMERIC) as amount, 'in' as direction
-                            FROM erc20_transfers
-                            WHERE token_address = $1 AND to_address != '0x0000000000000000000000000000000000000000'
-                            UNION ALL
-                            SELECT from_address as addr, CAST(value AS NUMERIC) as amount, 'out' as direction
-                            FROM erc20_transfers
-                            WHERE token_address = $1 AND from_address != '0x0000000000000000000000000000000000000000'
-                        ) transfers
-                        GROUP BY addr
-                        HAVING SUM(CASE WHEN direction = 'in' THEN amount ELSE -amount END) > 0
-                    ) holders) as holder_count,
+                    (SELECT COUNT(*) FROM token_balances
+                     WHERE token_address = $1 AND balance > 0) as holder_count,
                     COUNT(*) as transfer_count
                 FROM erc20_transfers
                 WHERE token_address = $1
@@ -1085,7 +1526,7 @@ async def get_token(address: str):
                 address
             )
 
-            return {
+            return json_response({
                 "address": address,
                 "name": erc20["name"] or "Unknown Token",
                 "symbol": erc20["symbol"] or "???",
@@ -1094,13 +1535,10 @@ async def get_token(address: str):
                 "tokenType": "ERC20",
                 "holderCount": stats["holder_count"] if stats else 0,
                 "transferCount": stats["transfer_count"] if stats else 0
-            }
+            })
 
         # Check ERC721
-        erc721 = await conn.fetchrow(
-            "SELECT * FROM erc721_tokens WHERE address = $1",
-            address
-        )
+        erc721 = await request.app.state.tokens.get_erc721(conn, address)
 
         if erc721:
             stats = await conn.fetchrow(
@@ -1114,7 +1552,7 @@ async def get_token(address: str):
                 address
             )
 
-            return {
+            return json_response({
                 "address": address,
                 "name": erc721["name"] or "Unknown NFT",
                 "symbol": erc721["symbol"] or "???",
@@ -1122,274 +1560,227 @@ async def get_token(address: str):
                 "tokenType": "ERC721",
                 "holderCount": stats["holder_count"] if stats else 0,
                 "transferCount": stats["transfer_count"] if stats else 0
-            }
+            })
 
     raise HTTPException(status_code=404, detail="Token not found")
 
 @app.get("/api/tokens/{address}/transfers")
 async def get_token_transfers(
+    request: Request,
     address: str,
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    page: int = DEPRECATED_PAGE,
+    limit: int = Query(20, ge=1, le=100),
+    after_block: Optional[int] = None,
+    after_index: Optional[int] = None
 ):
     address = address.lower()
-    offset = (page - 1) * limit
-
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        # Check if ERC20
-        erc20 = await conn.fetchrow(
-            "SELECT * FROM erc20_tokens WHERE address = $1",
-            address
-        )
-
-        if erc20:
-            rows = await conn.fetch(
-                """
-                SELECT et.*, b.timestamp
+    keyset = check_cursor(after_block, after_index)
+    offset = 0 if keyset else (page - 1) * limit
+    cursor = (after_block, after_index) if keyset else ()
+
+    db = request.app.state.db
+    tokens = request.app.state.tokens
+    # The token lookups share one short acquire; the page and the count then
+    # take connections of their own
+    async with db.acquire() as conn:
+        erc20 = await tokens.get_erc20(conn, address)
+        erc721 = None if erc20 else await tokens.get_erc721(conn, address)
+
+    if erc20:
+        rows, total = await asyncio.gather(
+            db.run(lambda conn: conn.fetch(
+                f"""
+                SELECT et.from_address, et.to_address, et.value, et.transaction_hash,
+                       et.block_number, et.log_index, {TRANSFER_TIMESTAMP_SQL} as timestamp
                 FROM erc20_transfers et
-                JOIN blocks b ON et.block_number = b.number
                 WHERE et.token_address = $1
+                {"AND (et.block_number, et.log_index) < ($4, $5)" if keyset else ""}
                 ORDER BY et.block_number DESC, et.log_index DESC
                 LIMIT $2 OFFSET $3
                 """,
-                address, limit, offset
-            )
-
-            count_row = await conn.fetchrow(
-                "SELECT COUNT(*) as total FROM erc20_transfers WHERE token_address = $1",
-                address
-            )
-
-            transfers = []
-            for row in rows:
-                transfers.append({
-                    "from": row["from_address"],
-                    "to": row["to_address"],
-                    "value": row["value"],
-                    "transactionHash": row["transaction_hash"],
-                    "blockNumber": str(row["block_number"]),
-                    "timestamp": str(row["timestamp"]),
-                    "logIndex": row["log_index"]
-                })
-
-            return {
-                "data": transfers,
-                "pagination": {
-                    "page": page,
-                    "limit": limit,
-                    "total": count_row["total"],
-                    "totalPages": (count_row["total"] + limit - 1) // limit
-                },
-                "token": {
-                    "address": address,
-                    "name": erc20["name"] or "Unknown",
-                    "symbol": erc20["symbol"] or "???",
-                    "decimals": erc20["decimals"] or 18
-                }
-            }
-
-        # Check ERC721
-        erc721 = await conn.fetchrow(
-            "SELECT * FROM erc721_tokens WHERE address = $1",
-            address
+                address, limit, offset, *cursor
+            )),
+            _counts.get(db, "SELECT COUNT(*) FROM erc20_transfers WHERE token_address = $1", address)
         )
 
-        if erc721:
-            rows = await conn.fetch(
-                """
-                SELECT et.*, b.timestamp
+        return stream_list_response(rows, format_erc20_token_transfer, pagination={
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "totalPages": (total + limit - 1) // limit,
+            "nextCursor": next_cursor(rows, limit, after_block="block_number", after_index="log_index")
+        }, token={
+            "address": address,
+            "name": erc20["name"] or "Unknown",
+            "symbol": erc20["symbol"] or "???",
+            "decimals": erc20["decimals"] or 18
+        })
+
+    if erc721:
+        rows, total = await asyncio.gather(
+            db.run(lambda conn: conn.fetch(
+                f"""
+                SELECT et.from_address, et.to_address, et.token_id, et.transaction_hash,
+                       et.block_number, et.log_index, {TRANSFER_TIMESTAMP_SQL} as timestamp
                 FROM erc721_transfers et
-                JOIN blocks b ON et.block_number = b.number
                 WHERE et.token_address = $1
+                {"AND (et.block_number, et.log_index) < ($4, $5)" if keyset else ""}
                 ORDER BY et.block_number DESC, et.log_index DESC
                 LIMIT $2 OFFSET $3
                 """,
-                address, limit, offset
-            )
-
-            count_row = await conn.fetchrow(
-                "SELECT COUNT(*) as total FROM erc721_transfers WHERE token_address = $1",
-                address
-            )
+                address, limit, offset, *cursor
+            )),
+            _counts.get(db, "SELECT COUNT(*) FROM erc721_transfers WHERE token_address = $1", address)
+        )
 
-            transfers = []
-            for row in rows:
-                transfers.append({
-                    "from": row["from_address"],
-                    "to": row["to_address"],
-                    "tokenId": row["token_id"],
-                    "transactionHash": row["transaction_hash"],
-                    "blockNumber": str(row["block_number"]),
-                    "timestamp": str(row["timestamp"]),
-                    "logIndex": row["log_index"]
-                })
-
-            return {
-                "data": transfers,
-                "pagination": {
-                    "page": page,
-                    "limit": limit,
-                    "total": count_row["total"],
-                    "totalPages": (count_row["total"] + limit - 1) // limit
-                },
-                "token": {
-                    "address": address,
-                    "name": erc721["name"] or "Unknown",
-                    "symbol": erc721["symbol"] or "???"
-                }
-            }
+        return stream_list_response(rows, format_erc721_token_transfer, pagination={
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "totalPages": (total + limit - 1) // limit,
+            "nextCursor": next_cursor(rows, limit, after_block="block_number", after_index="log_index")
+        }, token={
+            "address": address,
+            "name": erc721["name"] or "Unknown",
+            "symbol": erc721["symbol"] or "???"
+        })
 
     raise HTTPException(status_code=404, detail="Token not found")
 
 @app.get("/api/tokens/{address}/holders")
 async def get_token_holders(
+    request: Request,
     address: str,
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    page: int = DEPRECATED_PAGE,
+    limit: int = Query(20, ge=1, le=100),
+    after_balance: Optional[str] = Query(None, pattern=r"^[0-9]+$"),
+    after_address: Optional[str] = None
 ):
     address = address.lower()
-    offset = (page - 1) * limit
-
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        erc20 = await conn.fetchrow(
-            "SELECT * FROM erc20_tokens WHERE address = $1",
-            address
-        )
-
-        if erc20:
-            rows = await conn.fetch(
-                """
-                WITH balances AS (
-                    SELECT
-                        addr as holder,
-                        SUM(CASE WHEN direction = 'in' THEN amount ELSE -amount END) as balance
-                    FROM (
-                        SELECT to_address as addr, CAST(value AS NUMERIC) as amount, 'in' as direction
-                        FROM erc20_transfers
-                        WHERE token_address = $1 AND to_address != '0x0000000000000000000000000000000000000000'
-                        UNION ALL
-                        SELECT from_address as addr, CAST(value AS NUMERIC) as amount, 'out' as direction
-                        FROM erc20_transfers
-                        WHERE token_address = $1 AND from_address != '0x0000000000000000000000000000000000000000'
-                    ) transfers
-                    GROUP BY addr
-                    HAVING SUM(CASE WHEN direction = 'in' THEN amount ELSE -amount END) > 0
-                )
-                SELECT holder, balance
-                FROM balances
-                ORDER BY balance DESC
+    keyset = check_cursor(after_balance, after_address)
+    offset = 0 if keyset else (page - 1) * limit
+
+    # Top holders of popular tokens are requested over and over with the same
+    # parameters; serve them from Redis for holders_cache_ttl seconds
+    cache = request.app.state.cache
+    if cache:
+        # page is part of both key forms: the body echoes it in pagination.page
+        cache_key = f"holders:{address}:{limit}:{page}" + (f":{after_balance}:{after_address.lower()}" if keyset else "")
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            return RawJSONResponse(cached)
+
+    db = request.app.state.db
+    async with db.acquire() as conn:
+        erc20 = await request.app.state.tokens.get_erc20(conn, address)
+
+    if erc20:
+        # Balances are maintained per transfer by migrations/add_token_balances.sql;
+        # the zero address only ever sends (mints) so never has a positive balance
+        rows, total = await asyncio.gather(
+            db.run(lambda conn: conn.fetch(
+                f"""
+                SELECT address as holder, balance
+                FROM token_balances
+                WHERE token_address = $1 AND balance > 0
+                {"AND (balance, address) < ($4::numeric, $5)" if keyset else ""}
+                ORDER BY balance DESC, address DESC
                 LIMIT $2 OFFSET $3
                 """,
-                address, limit, offset
-            )
-
-            count_row = await conn.fetchrow(
-                """
-                SELECT COUNT(*) as total FROM (
-                    SELECT addr
-                    FROM (
-                        SELECT to_address as addr, CAST(value AS NUMERIC) as amount, 'in' as direction
-                        FROM erc20_transfers
-                        WHERE token_address = $1 AND to_address != '0x0000000000000000000000000000000000000000'
-                        UNION ALL
-                        SELECT from_address as addr, CAST(value AS NUMERIC) as amount, 'out' as direction
-                        FROM erc20_transfers
-                        WHERE token_address = $1 AND from_address != '0x0000000000000000000000000000000000000000'
-                    ) transfers
-                    GROUP BY addr
-                    HAVING SUM(CASE WHEN direction = 'in' THEN amount ELSE -amount END) > 0
-                ) holders
-                """,
-                address
-            )
+                address, limit, offset, *((after_balance, after_address.lower()) if keyset else ())
+            )),
+            _counts.get(db, "SELECT COUNT(*) FROM token_balances WHERE token_address = $1 AND balance > 0", address)
+        )
 
-            holders = []
-            for row in rows:
-                holders.append({
-                    "address": row["holder"],
-                    "balance": str(int(row["balance"]))
-                })
-
-            return {
-                "data": holders,
-                "pagination": {
-                    "page": page,
-                    "limit": limit,
-                    "total": count_row["total"] if count_row else 0,
-                    "totalPages": ((count_row["total"] if count_row else 0) + limit - 1) // limit
-                },
-                "token": {
-                    "address": address,
-                    "name": erc20["name"] or "Unknown",
-                    "symbol": erc20["symbol"] or "???",
-                    "decimals": erc20["decimals"] or 18
-                }
+        holders = [{"address": row["holder"], "balance": row["balance"]} for row in rows]
+
+        body = dump_json({
+            "data": holders,
+            "pagination": {
+                "page": page,
+                "limit": limit,
+                "total": total,
+                "totalPages": (total + limit - 1) // limit,
+                "nextCursor": next_cursor(rows, limit, after_balance="balance", after_address="holder")
+            },
+            "token": {
+                "address": address,
+                "name": erc20["name"] or "Unknown",
+                "symbol": erc20["symbol"] or "???",
+                "decimals": erc20["decimals"] or 18
             }
+        })
+        if cache:
+            await cache.set(cache_key, body, settings.holders_cache_ttl)
+        return RawJSONResponse(body)
 
     raise HTTPException(status_code=404, detail="Token not found")
 
 # ===== STATS ENDPOINT =====
 
 @app.get("/api/stats")
-async def get_stats():
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        stats = await conn.fetchrow(
-            """
-            SELECT
-                (SELECT MAX(number) FROM blocks) as latest_block,
-                (SELECT COUNT(*) FROM transactions) as total_transactions,
-                (SELECT COUNT(*) FROM contracts) as total_contracts,
-                (SELECT COUNT(*) FROM erc20_tokens) as total_erc20_tokens,
-                (SELECT COUNT(*) FROM erc721_tokens) as total_erc721_tokens
-            """
-        )
-
-    return {
+async def get_stats(request: Request):
+    return RawJSONResponse(await _stats_snapshot.get(request.app))
+
+async def build_stats(app):
+    db = app.state.db
+    tokens = app.state.tokens
+    # Table sizes are estimates rather than full COUNT(*) scans and token counts
+    # come from the in-memory token snapshot; MAX(number) reads the end of the
+    # blocks primary key. Every part is an index or catalog probe, so they stay
+    # in one statement (one round trip) rather than spreading over connections.
+    async with db.acquire(primary=True) as conn:
+        stats = await (await conn.prepared(STATS_SQL)).fetchrow()
+
+    return dump_json({
         "latestBlock": stats["latest_block"] or 0,
-        "totalTransactions": stats["total_transactions"] or 0,
-        "totalContracts": stats["total_contracts"] or 0,
-        "totalErc20Tokens": stats["total_erc20_tokens"] or 0,
-        "totalErc721Tokens": stats["total_erc721_tokens"] or 0
-    }
+        "totalTransactions": stats["total_transactions"],
+        "totalContracts": stats["total_contracts"],
+        "totalErc20Tokens": len(tokens.erc20),
+        "totalErc721Tokens": len(tokens.erc721)
+    })
+
+_stats_snapshot = Snapshot(build_stats)
 
 # ===== PROTOCOL ENDPOINTS =====
 
 @app.get("/api/protocols")
 async def get_protocols_list(
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100)
 ):
     offset = (page - 1) * limit
-    pool = await get_pool()
+    db = request.app.state.db
 
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
+    rows, total = await asyncio.gather(
+        db.run(lambda conn: conn.fetch(
             """
-            SELECT p.*,
-                   (SELECT COUNT(*) FROM contract_metadata cm WHERE cm.protocol_id = p.id) as contract_count
-            FROM protocols p
+            -- Contracts of the page's protocols counted in one grouped pass
+            -- instead of a correlated COUNT per protocol
+            WITH page AS (
+                SELECT * FROM protocols
+                ORDER BY name ASC
+                LIMIT $1 OFFSET $2
+            )
+            SELECT p.*, COALESCE(cc.contract_count, 0) as contract_count
+            FROM page p
+            LEFT JOIN (
+                SELECT protocol_id, COUNT(*) as contract_count
+                FROM contract_metadata
+                WHERE protocol_id IN (SELECT id FROM page)
+                GROUP BY protocol_id
+            ) cc ON cc.protocol_id = p.id
             ORDER BY p.name ASC
-            LIMIT $1 OFFSET $2
             """,
             limit, offset
-        )
-
-        count_row = await conn.fetchrow(
-            "SELECT COUNT(*) as total FROM protocols"
-        )
+        )),
+        _counts.get(db, "SELECT COUNT(*) FROM protocols")
+    )
 
-    protocols = []
-    for row in rows:
-        protocol = format_protocol(row)
-        protocol["contractCount"] = row["contract_count"]
-        protocols.append(protocol)
+    protocols = [{**format_protocol(row), "contractCount": row["contract_count"]} for row in rows]
 
-    total = count_row["total"] if count_row else 0
-
-    return {
+    return json_response({
         "data": protocols,
         "pagination": {
             "page": page,
@@ -1397,24 +1788,25 @@ async def get_protocols_list(
             "total": total,
             "totalPages": (total + limit - 1) // limit
         }
-    }
+    })
+
+# A protocol by id or by case-insensitive name, as one prepared statement;
+# protocol_key() leaves exactly one of the two parameters non-NULL. Columns are
+# explicit for the same reason as database.HOT_SQL.
+PROTOCOL_SQL = (
+    "SELECT id, name, description, logo_url, website, twitter, github, docs, discord, "
+    "telegram, is_live, indexed_at FROM protocols WHERE id = $1 OR LOWER(name) = LOWER($2)"
+)
+
+def protocol_key(protocol_id):
+    return (int(protocol_id), None) if protocol_id.isdigit() else (None, protocol_id)
 
 @app.get("/api/protocols/{protocol_id}")
-async def get_protocol(protocol_id: str):
-    pool = await get_pool()
+async def get_protocol(request: Request, protocol_id: str):
+    db = request.app.state.db
 
-    async with pool.acquire() as conn:
-        # Try to find by ID or name
-        if protocol_id.isdigit():
-            row = await conn.fetchrow(
-                "SELECT * FROM protocols WHERE id = $1",
-                int(protocol_id)
-            )
-        else:
-            row = await conn.fetchrow(
-                "SELECT * FROM protocols WHERE LOWER(name) = LOWER($1)",
-                protocol_id
-            )
+    async with db.acquire() as conn:
+        row = await (await conn.prepared(PROTOCOL_SQL)).fetchrow(*protocol_key(protocol_id))
 
         if not row:
             raise HTTPException(status_code=404, detail="Protocol not found")
@@ -1424,7 +1816,8 @@ async def get_protocol(protocol_id: str):
         # Get all contracts for this protocol
         contracts = await conn.fetch(
             """
-            SELECT cm.*, c.creator_address, c.creation_tx_hash, c.creation_block_number,
+            SELECT cm.*, c.creator_address, c.creation_tx_hash,
+                   NULLIF(c.creation_block_number, 0)::text as creation_block_number,
                    c.is_erc20, c.is_erc721, c.is_erc1155, c.verified,
                    e20.name as token_name, e20.symbol as token_symbol, e20.decimals as token_decimals
             FROM contract_metadata cm
@@ -1436,62 +1829,30 @@ async def get_protocol(protocol_id: str):
             row["id"]
         )
 
-        protocol["contracts"] = []
-        for contract in contracts:
-            contract_info = {
-                "address": contract["address"],
-                "contractName": contract["contract_name"],
-                "nickname": contract["nickname"],
-                "notes": contract["notes"],
-                "creatorAddress": contract["creator_address"],
-                "creationTxHash": contract["creation_tx_hash"],
-                "creationBlockNumber": str(contract["creation_block_number"]) if contract["creation_block_number"] else None,
-                "isErc20": contract["is_erc20"],
-                "isErc721": contract["is_erc721"],
-                "isErc1155": contract["is_erc1155"],
-                "verified": contract["verified"]
-            }
-
-            # Add token info if it's an ERC20
-            if contract["token_name"] or contract["token_symbol"]:
-                contract_info["tokenInfo"] = {
-                    "name": contract["token_name"],
-                    "symbol": contract["token_symbol"],
-                    "decimals": contract["token_decimals"]
-                }
-
-            protocol["contracts"].append(contract_info)
+        protocol["contracts"] = [format_protocol_contract(contract) for contract in contracts]
 
-    return protocol
+    return json_response(protocol)
 
 @app.get("/api/protocols/{protocol_id}/contracts")
 async def get_protocol_contracts(
+    request: Request,
     protocol_id: str,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100)
 ):
     offset = (page - 1) * limit
-    pool = await get_pool()
-
-    async with pool.acquire() as conn:
-        # Get protocol
-        if protocol_id.isdigit():
-            protocol_row = await conn.fetchrow(
-                "SELECT * FROM protocols WHERE id = $1",
-                int(protocol_id)
-            )
-        else:
-            protocol_row = await conn.fetchrow(
-                "SELECT * FROM protocols WHERE LOWER(name) = LOWER($1)",
-                protocol_id
-            )
+    db = request.app.state.db
+
+    async with db.acquire() as conn:
+        protocol_row = await (await conn.prepared(PROTOCOL_SQL)).fetchrow(*protocol_key(protocol_id))
 
         if not protocol_row:
             raise HTTPException(status_code=404, detail="Protocol not found")
 
         rows = await conn.fetch(
             """
-            SELECT cm.*, c.creator_address, c.creation_tx_hash, c.creation_block_number,
+            SELECT cm.*, c.creator_address, c.creation_tx_hash,
+                   NULLIF(c.creation_block_number, 0)::text as creation_block_number,
                    c.is_erc20, c.is_erc721, c.is_erc1155, c.verified,
                    e20.name as token_name, e20.symbol as token_symbol, e20.decimals as token_decimals
             FROM contract_metadata cm
@@ -1509,34 +1870,11 @@ async def get_protocol_contracts(
             protocol_row["id"]
         )
 
-    contracts = []
-    for contract in rows:
-        contract_info = {
-            "address": contract["address"],
-            "contractName": contract["contract_name"],
-            "nickname": contract["nickname"],
-            "notes": contract["notes"],
-            "creatorAddress": contract["creator_address"],
-            "creationTxHash": contract["creation_tx_hash"],
-            "creationBlockNumber": str(contract["creation_block_number"]) if contract["creation_block_number"] else None,
-            "isErc20": contract["is_erc20"],
-            "isErc721": contract["is_erc721"],
-            "isErc1155": contract["is_erc1155"],
-            "verified": contract["verified"]
-        }
-
-        if contract["token_name"] or contract["token_symbol"]:
-            contract_info["tokenInfo"] = {
-                "name": contract["token_name"],
-                "symbol": contract["token_symbol"],
-                "decimals": contract["token_decimals"]
-            }
-
-        contracts.append(contract_info)
+    contracts = [format_protocol_contract(contract) for contract in rows]
 
     total = count_row["total"] if count_row else 0
 
-    return {
+    return json_response({
         "data": contracts,
         "protocol": format_protocol(protocol_row),
         "pagination": {
@@ -1545,16 +1883,16 @@ async def get_protocol_contracts(
             "total": total,
             "totalPages": (total + limit - 1) // limit
         }
-    }
+    })
 
 # ===== CONTRACT METADATA ENDPOINTS =====
 
 @app.get("/api/contracts/{address}/metadata")
-async def get_contract_metadata(address: str):
+async def get_contract_metadata(request: Request, address: str):
     address = address.lower()
-    pool = await get_pool()
+    db = request.app.state.db
 
-    async with pool.acquire() as conn:
+    async with db.acquire() as conn:
         row = await conn.fetchrow(
             """
             SELECT cm.*,
@@ -1577,35 +1915,33 @@ async def get_contract_metadata(address: str):
 
         if not row:
             # Check if it's at least a known contract
-            contract = await conn.fetchrow(
-                "SELECT * FROM contracts WHERE address = $1",
-                address
-            )
+            contract = await (await conn.prepared(CONTRACT_SQL)).fetchrow(address)
             if not contract:
                 raise HTTPException(status_code=404, detail="Contract metadata not found")
 
             # Return basic contract info without protocol metadata
-            return {
+            return json_response({
                 "address": address,
                 "contractName": None,
                 "nickname": None,
                 "notes": None,
                 "protocol": None,
                 "indexedAt": None
-            }
+            })
 
-    return format_contract_metadata(row)
+    return json_response(format_contract_metadata(row))
 
 @app.get("/api/contracts/with-metadata")
 async def get_contracts_with_metadata(
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100)
 ):
     offset = (page - 1) * limit
-    pool = await get_pool()
+    db = request.app.state.db
 
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
+    rows, total = await asyncio.gather(
+        db.run(lambda conn: conn.fetch(
             """
             SELECT cm.*,
                    p.name as protocol_name,
@@ -1620,7 +1956,7 @@ async def get_contracts_with_metadata(
                    p.is_live as protocol_is_live,
                    c.creator_address,
                    c.creation_tx_hash,
-                   c.creation_block_number,
+                   NULLIF(c.creation_block_number, 0)::text as creation_block_number,
                    c.is_erc20,
                    c.is_erc721,
                    c.is_erc1155,
@@ -1632,27 +1968,25 @@ async def get_contracts_with_metadata(
             LIMIT $1 OFFSET $2
             """,
             limit, offset
-        )
-
-        count_row = await conn.fetchrow(
-            "SELECT COUNT(*) as total FROM contract_metadata"
-        )
-
-    contracts = []
-    for row in rows:
-        contract_info = format_contract_metadata(row)
-        contract_info["creatorAddress"] = row["creator_address"]
-        contract_info["creationTxHash"] = row["creation_tx_hash"]
-        contract_info["creationBlockNumber"] = str(row["creation_block_number"]) if row["creation_block_number"] else None
-        contract_info["isErc20"] = row["is_erc20"]
-        contract_info["isErc721"] = row["is_erc721"]
-        contract_info["isErc1155"] = row["is_erc1155"]
-        contract_info["verified"] = row["verified"]
-        contracts.append(contract_info)
-
-    total = count_row["total"] if count_row else 0
+        )),
+        _counts.get(db, "SELECT COUNT(*) FROM contract_metadata")
+    )
+
+    contracts = [
+        {
+            **format_contract_metadata(row),
+            "creatorAddress": row["creator_address"],
+            "creationTxHash": row["creation_tx_hash"],
+            "creationBlockNumber": row["creation_block_number"],
+            "isErc20": row["is_erc20"],
+            "isErc721": row["is_erc721"],
+            "isErc1155": row["is_erc1155"],
+            "verified": row["verified"]
+        }
+        for row in rows
+    ]
 
-    return {
+    return json_response({
         "data": contracts,
         "pagination": {
             "page": page,
@@ -1660,70 +1994,63 @@ async def get_contracts_with_metadata(
             "total": total,
             "totalPages": (total + limit - 1) // limit
         }
-    }
+    })
+
+# One statement text for every filter combination, so it is prepared once per
+# connection; a NULL pattern disables its filter
+CONTRACT_SEARCH_FILTER = """
+    ($1::text IS NULL OR LOWER(p.name) LIKE LOWER($1))
+    AND ($2::text IS NULL OR LOWER(cm.contract_name) LIKE LOWER($2) OR LOWER(cm.nickname) LIKE LOWER($2))
+"""
+
+CONTRACT_SEARCH_SQL = f"""
+    SELECT cm.*,
+           p.name as protocol_name,
+           p.description as protocol_description,
+           p.logo_url as protocol_logo_url,
+           p.website as protocol_website,
+           p.twitter as protocol_twitter,
+           p.github as protocol_github,
+           p.docs as protocol_docs,
+           p.discord as protocol_discord,
+           p.telegram as protocol_telegram,
+           p.is_live as protocol_is_live
+    FROM contract_metadata cm
+    LEFT JOIN protocols p ON cm.protocol_id = p.id
+    WHERE {CONTRACT_SEARCH_FILTER}
+    ORDER BY p.name ASC, cm.contract_name ASC
+    LIMIT $3 OFFSET $4
+"""
+
+CONTRACT_SEARCH_COUNT_SQL = f"""
+    SELECT COUNT(*)
+    FROM contract_metadata cm
+    LEFT JOIN protocols p ON cm.protocol_id = p.id
+    WHERE {CONTRACT_SEARCH_FILTER}
+"""
 
 @app.get("/api/contracts/search")
 async def search_contracts_by_protocol(
+    request: Request,
     protocol: Optional[str] = None,
     name: Optional[str] = None,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100)
 ):
     offset = (page - 1) * limit
-    pool = await get_pool()
-
-    async with pool.acquire() as conn:
-        # Build query based on filters
-        where_clauses = []
-        params = []
-        param_count = 0
+    db = request.app.state.db
 
-        if protocol:
-            param_count += 1
-            where_clauses.append(f"LOWER(p.name) LIKE LOWER(${param_count})")
-            params.append(f"%{protocol}%")
+    protocol_pattern = f"%{protocol}%" if protocol else None
+    name_pattern = f"%{name}%" if name else None
 
-        if name:
-            param_count += 1
-            where_clauses.append(f"(LOWER(cm.contract_name) LIKE LOWER(${param_count}) OR LOWER(cm.nickname) LIKE LOWER(${param_count}))")
-            params.append(f"%{name}%")
-
-        where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
-
-        query = f"""
-            SELECT cm.*,
-                   p.name as protocol_name,
-                   p.description as protocol_description,
-                   p.logo_url as protocol_logo_url,
-                   p.website as protocol_website,
-                   p.twitter as protocol_twitter,
-                   p.github as protocol_github,
-                   p.docs as protocol_docs,
-                   p.discord as protocol_discord,
-                   p.telegram as protocol_telegram,
-                   p.is_live as protocol_is_live
-            FROM contract_metadata cm
-            LEFT JOIN protocols p ON cm.protocol_id = p.id
-            WHERE {where_sql}
-            ORDER BY p.name ASC, cm.contract_name ASC
-            LIMIT ${param_count + 1} OFFSET ${param_count + 2}
-        """
-
-        params.extend([limit, offset])
-        rows = await conn.fetch(query, *params)
-
-        count_query = f"""
-            SELECT COUNT(*) as total
-            FROM contract_metadata cm
-            LEFT JOIN protocols p ON cm.protocol_id = p.id
-            WHERE {where_sql}
-        """
-        count_row = await conn.fetchrow(count_query, *params[:-2])
+    rows, total = await asyncio.gather(
+        db.run(lambda conn: conn.fetch(CONTRACT_SEARCH_SQL, protocol_pattern, name_pattern, limit, offset)),
+        _counts.get(db, CONTRACT_SEARCH_COUNT_SQL, protocol_pattern, name_pattern)
+    )
 
     contracts = [format_contract_metadata(row) for row in rows]
-    total = count_row["total"] if count_row else 0
 
-    return {
+    return json_response({
         "data": contracts,
         "pagination": {
             "page": page,
@@ -1731,8 +2058,14 @@ async def search_contracts_by_protocol(
             "total": total,
             "totalPages": (total + limit - 1) // limit
         }
-    }
+    })
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=3000)
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        # uvloop is not available on Windows
+        loop = "asyncio"
+    uvicorn.run(app, host="0.0.0.0", port=3000, loop=loop)
@@ -0,0 +1,110 @@
+-- Migration: Add token_balances and nft_ownership tables
+-- Balances/owners are maintained by statement-level triggers on the transfer
+-- tables, so the API reads them with an indexed lookup instead of aggregating
+-- every transfer of an address on each request
+
+CREATE TABLE IF NOT EXISTS token_balances (
+    address TEXT NOT NULL,
+    token_address TEXT NOT NULL,
+    balance NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (address, token_address)
+);
+
+-- Balances of an address, largest first (address token-balances endpoint)
+CREATE INDEX IF NOT EXISTS idx_token_balances_address_balance ON token_balances(address, balance DESC);
+
+-- Holders of a token, largest first (token holders endpoint, its (balance, address)
+-- cursor, and holder counts)
+DROP INDEX IF EXISTS idx_token_balances_token_balance;
+CREATE INDEX IF NOT EXISTS idx_token_balances_token_balance_address ON token_balances(token_address, balance DESC, address DESC) WHERE balance > 0;
+
+CREATE TABLE IF NOT EXISTS nft_ownership (
+    token_address TEXT NOT NULL,
+    token_id TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    -- Position of the transfer that set the owner; older transfers indexed
+    -- out of order never overwrite a newer one
+    block_number BIGINT NOT NULL,
+    log_index INTEGER NOT NULL,
+    PRIMARY KEY (token_address, token_id)
+);
+
+-- NFTs held by an address (address nfts endpoint)
+CREATE INDEX IF NOT EXISTS idx_nft_ownership_owner ON nft_ownership(owner, token_address, token_id);
+
+-- balance += delta for both legs of every inserted transfer, one upsert per
+-- statement and one pass over the transition table.
+-- Rows are upserted in key order so concurrent batches can't deadlock.
+CREATE OR REPLACE FUNCTION apply_erc20_transfers() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO token_balances (address, token_address, balance)
+    SELECT legs.address, t.token_address, SUM(legs.delta)
+    FROM new_rows t
+    CROSS JOIN LATERAL (VALUES
+        (t.to_address, CAST(t.value AS NUMERIC)),
+        (t.from_address, -CAST(t.value AS NUMERIC))
+    ) legs(address, delta)
+    GROUP BY legs.address, t.token_address
+    ORDER BY legs.address, t.token_address
+    ON CONFLICT (address, token_address)
+    DO UPDATE SET balance = token_balances.balance + EXCLUDED.balance;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Latest transfer of each token wins
+CREATE OR REPLACE FUNCTION apply_erc721_transfers() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO nft_ownership (token_address, token_id, owner, block_number, log_index)
+    SELECT DISTINCT ON (token_address, token_id)
+        token_address, token_id, to_address, block_number, log_index
+    FROM new_rows
+    ORDER BY token_address, token_id, block_number DESC, log_index DESC
+    ON CONFLICT (token_address, token_id)
+    DO UPDATE SET owner = EXCLUDED.owner, block_number = EXCLUDED.block_number, log_index = EXCLUDED.log_index
+    WHERE (nft_ownership.block_number, nft_ownership.log_index) < (EXCLUDED.block_number, EXCLUDED.log_index);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Install the triggers and backfill from existing transfers atomically; the
+-- lock blocks concurrent inserts so no transfer is counted twice or missed.
+-- Safe to re-run: the tables are rebuilt from scratch.
+BEGIN;
+
+LOCK TABLE erc20_transfers, erc721_transfers IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trg_erc20_transfers_balances ON erc20_transfers;
+CREATE TRIGGER trg_erc20_transfers_balances
+    AFTER INSERT ON erc20_transfers
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_erc20_transfers();
+
+DROP TRIGGER IF EXISTS trg_erc721_transfers_ownership ON erc721_transfers;
+CREATE TRIGGER trg_erc721_transfers_ownership
+    AFTER INSERT ON erc721_transfers
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_erc721_transfers();
+
+TRUNCATE token_balances, nft_ownership;
+
+-- Both legs of each transfer come from a single pass over erc20_transfers
+INSERT INTO token_balances (address, token_address, balance)
+SELECT legs.address, t.token_address, SUM(legs.delta)
+FROM erc20_transfers t
+CROSS JOIN LATERAL (VALUES
+    (t.to_address, CAST(t.value AS NUMERIC)),
+    (t.from_address, -CAST(t.value AS NUMERIC))
+) legs(address, delta)
+GROUP BY legs.address, t.token_address;
+
+INSERT INTO nft_ownership (token_address, token_id, owner, block_number, log_index)
+SELECT DISTINCT ON (token_address, token_id)
+    token_address, token_id, to_address, block_number, log_index
+FROM erc721_transfers
+ORDER BY token_address, token_id, block_number DESC, log_index DESC;
+
+COMMIT;
+
+ANALYZE token_balances;
+ANALYZE nft_ownership;
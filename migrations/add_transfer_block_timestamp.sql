@@ -0,0 +1,102 @@
+-- Migration: Denormalize the block timestamp onto erc20_transfers / erc721_transfers
+-- Transfer listings read the timestamp from the transfer row instead of joining
+-- blocks for every row, so the (token_address, block_number, log_index) index
+-- alone answers an ordered, limited page.
+--
+-- Not transaction-safe (the backfill commits per batch, the indexes are built
+-- CONCURRENTLY): run_migration.py applies it one statement at a time and
+-- records it only once every statement has succeeded. Every statement is
+-- idempotent, so after a failure fix the cause and re-run the runner. By
+-- hand, run it with psql outside a transaction, then insert its filename
+-- into schema_migrations.
+
+ALTER TABLE erc20_transfers ADD COLUMN IF NOT EXISTS block_timestamp BIGINT;
+ALTER TABLE erc721_transfers ADD COLUMN IF NOT EXISTS block_timestamp BIGINT;
+
+-- The indexer's batch writer fills block_timestamp itself; this covers any
+-- other writer (single-row inserts, migration scripts)
+CREATE OR REPLACE FUNCTION fill_transfer_block_timestamp() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.block_timestamp IS NULL THEN
+        SELECT timestamp INTO NEW.block_timestamp FROM blocks WHERE number = NEW.block_number;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_erc20_transfers_block_timestamp ON erc20_transfers;
+CREATE TRIGGER trg_erc20_transfers_block_timestamp
+    BEFORE INSERT ON erc20_transfers
+    FOR EACH ROW EXECUTE FUNCTION fill_transfer_block_timestamp();
+
+DROP TRIGGER IF EXISTS trg_erc721_transfers_block_timestamp ON erc721_transfers;
+CREATE TRIGGER trg_erc721_transfers_block_timestamp
+    BEFORE INSERT ON erc721_transfers
+    FOR EACH ROW EXECUTE FUNCTION fill_transfer_block_timestamp();
+
+-- Backfill existing rows in id ranges, one transaction per batch, so the
+-- indexer is never blocked behind a single table-wide UPDATE
+CREATE OR REPLACE PROCEDURE backfill_transfer_block_timestamp(batch_size BIGINT DEFAULT 50000)
+LANGUAGE plpgsql AS $$
+DECLARE
+    max_id BIGINT;
+    start_id BIGINT;
+BEGIN
+    SELECT COALESCE(MAX(id), 0) INTO max_id FROM erc20_transfers;
+    start_id := 0;
+    WHILE start_id < max_id LOOP
+        UPDATE erc20_transfers et SET block_timestamp = b.timestamp
+        FROM blocks b
+        WHERE et.id > start_id AND et.id <= start_id + batch_size
+          AND et.block_timestamp IS NULL AND b.number = et.block_number;
+        start_id := start_id + batch_size;
+        COMMIT;
+    END LOOP;
+
+    SELECT COALESCE(MAX(id), 0) INTO max_id FROM erc721_transfers;
+    start_id := 0;
+    WHILE start_id < max_id LOOP
+        UPDATE erc721_transfers et SET block_timestamp = b.timestamp
+        FROM blocks b
+        WHERE et.id > start_id AND et.id <= start_id + batch_size
+          AND et.block_timestamp IS NULL AND b.number = et.block_number;
+        start_id := start_id + batch_size;
+        COMMIT;
+    END LOOP;
+END;
+$$;
+
+CALL backfill_transfer_block_timestamp();
+
+-- Token transfer pages straight off the index, newest first; the INCLUDE list
+-- is every column the token transfers endpoint selects, so pages are
+-- index-only scans
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc20_transfers_token_block_log_cover
+    ON erc20_transfers(token_address, block_number DESC, log_index DESC)
+    INCLUDE (block_timestamp, from_address, to_address, value, transaction_hash);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_erc721_transfers_token_block_log_cover
+    ON erc721_transfers(token_address, block_number DESC, log_index DESC)
+    INCLUDE (block_timestamp, from_address, to_address, token_id, transaction_hash);
+-- An interrupted CONCURRENTLY build leaves an INVALID index behind, which
+-- IF NOT EXISTS then skips; stop here rather than drop the old indexes while
+-- the covering ones can't serve queries
+DO $$
+DECLARE
+    invalid TEXT;
+BEGIN
+    SELECT string_agg(name, ', ') INTO invalid
+    FROM unnest(ARRAY['idx_erc20_transfers_token_block_log_cover', 'idx_erc721_transfers_token_block_log_cover']) name
+    LEFT JOIN pg_index i ON i.indexrelid = to_regclass(name)
+    WHERE i.indisvalid IS NOT TRUE;
+    IF invalid IS NOT NULL THEN
+        RAISE EXCEPTION 'covering indexes missing or invalid: % (DROP INDEX CONCURRENTLY them and re-run)', invalid;
+    END IF;
+END
+$$;
+
+-- Superseded by the covering indexes above
+DROP INDEX CONCURRENTLY IF EXISTS idx_erc20_transfers_token_block_log;
+DROP INDEX CONCURRENTLY IF EXISTS idx_erc721_transfers_token_block_log;
+
+ANALYZE erc20_transfers;
+ANALYZE erc721_transfers;
@@ -1,44 +1,229 @@
+"""Apply pending migrations/*.sql files to DATABASE_URL.
+
+The client side is network-bound, not CPU-bound: a run costs one ledger read
+plus one round trip per transaction-safe file (migration, verification and
+ledger row in a single script), or one per statement for files that manage
+their own transactions. Each file is read and parsed once per process, off
+the event loop. Beyond that, the time is spent by Postgres running the DDL
+and backfills, so tune those rather than the Python. What keeps it cheap:
+a shared pool, one connection per run, one script per file, a ledger insert
+prepared once per run, and skipping files already recorded in
+schema_migrations.
+"""
 import asyncio
 import asyncpg
+import functools
+import glob
+import logging
+import os
+import re
+
+log = logging.getLogger('migration')
+
+MIGRATIONS_DIR = 'migrations'
+
+DSN = os.environ.get('DATABASE_URL', 'postgres://postgres@127.0.0.1:5432/postgres')
+
+# Files that manage their own transactions (explicit BEGIN/COMMIT, procedures
+# that commit, CONCURRENTLY index builds) can't run inside a transaction block
+SELF_MANAGED_RE = re.compile(r'^\s*(?:BEGIN|COMMIT)\s*;|^\s*CALL\s|\bCONCURRENTLY\b', re.IGNORECASE | re.MULTILINE)
+DOLLAR_QUOTE_RE = re.compile(r'\$(?:[A-Za-z_]\w*)?\$')
+IDENTIFIER = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+CREATE_TABLE_RE = re.compile(
+    rf'\bCREATE\s+(?:UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?({IDENTIFIER}(?:\s*\.\s*{IDENTIFIER})*)',
+    re.IGNORECASE
+)
+
+async def create_pool():
+    # One pool serves every migration run in the process, so only the first
+    # one pays for the connection handshake
+    return await asyncpg.create_pool(
+        dsn=DSN,
+        min_size=1,
+        max_size=4,
+        # No command_timeout: backfills and CONCURRENTLY index builds run for
+        # minutes, and cancelling a CONCURRENTLY build leaves an INVALID index
+        # Keep prepared statements for the life of the connection instead of
+        # asyncpg's 100 entries / 300 s, so long runs never re-parse them
+        statement_cache_size=1024,
+        max_cached_statement_lifetime=0
+    )
+
+LEDGER_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        filename TEXT PRIMARY KEY,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+# Appended to a migration for the tables it creates, so the same execute
+# verifies them; raising rolls a transactional migration back. Names resolve
+# exactly as they did in the CREATE TABLE (search_path, quoting).
+VERIFY_SQL = """
+DO $verify$
+DECLARE
+    missing TEXT;
+BEGIN
+    SELECT string_agg(t, ', ') INTO missing
+    FROM unnest(ARRAY[{}]::text[]) t
+    WHERE to_regclass(t) IS NULL;
+    IF missing IS NOT NULL THEN
+        RAISE EXCEPTION 'tables missing after migration: %', missing;
+    END IF;
+END
+$verify$;
+"""
+RECORD_SQL = 'INSERT INTO schema_migrations (filename) VALUES ($1) ON CONFLICT DO NOTHING'
+# Same insert appended to a transaction-safe script
+RECORD_SCRIPT_SQL = "\nINSERT INTO schema_migrations (filename) VALUES ('{}') ON CONFLICT DO NOTHING;\n"
+
+async def _applied(conn):
+    # Filenames recorded in the ledger, so a re-run only reads this table;
+    # the ledger is created here, once per run
+    await conn.execute(LEDGER_SQL)
+    rows = await conn.fetch('SELECT filename FROM schema_migrations')
+    return {row['filename'] for row in rows}
+
+def _lex(sql):
+    # (kind, start, end) of every comment, string literal (quoted or
+    # dollar-quoted), quoted identifier and semicolon in sql; anything inside
+    # the first three is opaque
+    i = 0
+    n = len(sql)
+    while i < n:
+        c = sql[i]
+        if c == "'" or c == '"':
+            end = sql.find(c, i + 1)
+            end = n if end < 0 else end + 1
+            kind = 'string' if c == "'" else 'identifier'
+        elif sql.startswith('--', i):
+            end = sql.find('\n', i)
+            end = n if end < 0 else end + 1
+            kind = 'comment'
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            kind = 'comment'
+        elif c == '$' and (m := DOLLAR_QUOTE_RE.match(sql, i)):
+            end = sql.find(m.group(), m.end())
+            end = n if end < 0 else end + len(m.group())
+            kind = 'string'
+        elif c == ';':
+            end = i + 1
+            kind = 'semicolon'
+        else:
+            i += 1
+            continue
+        yield kind, i, end
+        i = end
 
-async def run_migration():
+def _split_statements(sql):
+    # Top-level statements of a file; semicolons inside quotes, dollar-quoted
+    # bodies and comments don't end a statement
+    statements = []
+    start = 0
+    for kind, _, end in _lex(sql):
+        if kind == 'semicolon':
+            statements.append(sql[start:end].strip())
+            start = end
+    if sql[start:].strip():
+        statements.append(sql[start:].strip())
+    return statements
+
+def _created_tables(sql):
+    # Tables created by sql, names as written (schema-qualified and quoted
+    # forms included); comments and string literals are blanked out first so
+    # commented-out DDL and function bodies don't count
+    parts = []
+    start = 0
+    for kind, i, end in _lex(sql):
+        if kind == 'comment' or kind == 'string':
+            parts.append(sql[start:i])
+            parts.append(' ')
+            start = end
+    parts.append(sql[start:])
+    return tuple(dict.fromkeys(CREATE_TABLE_RE.findall(''.join(parts))))
+
+@functools.lru_cache(maxsize=None)
+def _load_migration(path):
+    # Read and specialize each file once per process: the tables it creates
+    # and the exact statements to send. Transaction-safe files stay a single
+    # script (one round trip) that also records itself in the ledger;
+    # self-managed ones are pre-split.
+    with open(path, 'r') as f:
+        sql = f.read()
+    created = _created_tables(sql)
+    if created:
+        sql += VERIFY_SQL.format(', '.join("'{}'".format(table.replace("'", "''")) for table in created))
+    if SELF_MANAGED_RE.search(sql):
+        return created, False, tuple(_split_statements(sql))
+    sql += RECORD_SCRIPT_SQL.format(os.path.basename(path).replace("'", "''"))
+    return created, True, (sql,)
+
+async def _apply(conn, record, path):
+    name = os.path.basename(path)
+    # Read off the event loop so an importing orchestrator's other tasks keep
+    # running meanwhile
+    created, transactional, statements = await asyncio.to_thread(_load_migration, path)
+
+    # Execute migration: a transaction-safe file goes out as one
+    # simple-query message, which Postgres runs as a single implicit
+    # transaction: migration, verification and ledger row commit together
+    # in one round trip, and a failing statement rolls back all of them
+    if transactional:
+        await conn.execute(statements[0])
+    else:
+        # Postgres runs a multi-statement query as one implicit
+        # transaction, which CONCURRENTLY and committing procedures
+        # refuse, so these go out one statement at a time
+        for i, statement in enumerate(statements):
+            try:
+                await conn.execute(statement)
+            except asyncpg.PostgresError:
+                # Statements before this one stay committed; the file is
+                # left out of the ledger so the next run starts it over
+                log.error('ERROR: %s partially applied: statement %d of %d failed; '
+                          'not recorded, re-run once fixed', name, i + 1, len(statements))
+                raise
+        await record.fetch(name)
+
+    log.info('SUCCESS: %s completed successfully!', name)
+    if created:
+        log.info('SUCCESS: %s: verified tables exist: %s', name, ', '.join(created))
+
+async def run_migration(pool=None):
+    # Migrations on one schema build on each other, so pending files are
+    # applied one after another in filename order, stopping at the first failure
+    own_pool = pool is None
+    if own_pool:
+        pool = await create_pool()
     try:
-        # Connect to PostgreSQL
-        conn = await asyncpg.connect(
-            host='127.0.0.1',
-            port=5432,
-            user='postgres',
-            password='',
-            database='postgres'
-        )
-
-        # Read migration file
-        with open('migrations/add_protocol_metadata.sql', 'r') as f:
-            sql = f.read()
-
-        # Execute migration
-        await conn.execute(sql)
-
-        print('SUCCESS: Migration completed successfully!')
-        print('SUCCESS: Created tables: protocols, contract_metadata')
-
-        # Verify tables exist
-        tables = await conn.fetch("""
-            SELECT table_name
-            FROM information_schema.tables
-            WHERE table_schema = 'public'
-            AND table_name IN ('protocols', 'contract_metadata')
-        """)
-
-        print(f'\nSUCCESS: Verified tables exist:')
-        for table in tables:
-            print(f'   - {table["table_name"]}')
-
-        await conn.close()
-
-    except Exception as e:
-        print(f'ERROR: Error running migration: {e}')
+        # One connection for the whole run, so the ledger insert is prepared
+        # once and reused for every self-managed file
+        async with pool.acquire() as conn:
+            applied = await _applied(conn)
+            paths = [
+                path for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, '*.sql')))
+                if os.path.basename(path) not in applied
+            ]
+            if paths:
+                record = await conn.prepare(RECORD_SQL)
+            for path in paths:
+                await _apply(conn, record, path)
+
+    except asyncpg.PostgresError as e:
+        log.error('ERROR: Error running migration: %s', e)
         raise
+    finally:
+        if own_pool:
+            await pool.close()
+
+async def _main():
+    pool = await create_pool()
+    try:
+        await run_migration(pool)
+    finally:
+        await pool.close()
 
 if __name__ == '__main__':
-    asyncio.run(run_migration())
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    asyncio.run(_main())
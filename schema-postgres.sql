@@ -152,6 +152,7 @@ CREATE TABLE IF NOT EXISTS erc20_transfers (
     from_address TEXT NOT NULL,
     to_address TEXT NOT NULL,
     value TEXT NOT NULL,
+    block_timestamp BIGINT,
     indexed_at BIGINT DEFAULT EXTRACT(EPOCH FROM NOW())::BIGINT
 );
 
@@ -165,6 +166,7 @@ CREATE TABLE IF NOT EXISTS erc721_transfers (
     from_address TEXT NOT NULL,
     to_address TEXT NOT NULL,
     token_id TEXT NOT NULL,
+    block_timestamp BIGINT,
     indexed_at BIGINT DEFAULT EXTRACT(EPOCH FROM NOW())::BIGINT
 );
 
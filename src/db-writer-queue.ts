@@ -333,17 +333,22 @@ export class BackgroundDBWriter {
         );
       }
 
+      // Block timestamps denormalized onto transfer rows (null falls back to the
+      // fill_transfer_block_timestamp trigger for blocks outside this batch)
+      const blockTimestamps = new Map(blocks.map(block => [block.number, block.timestamp]));
+
       // Batch insert ERC20 transfers (no unique constraint)
       if (erc20Transfers.length > 0) {
         const transferRows = erc20Transfers.map(t => [
           t.txHash, t.logIndex, t.blockNumber, t.tokenAddress.toLowerCase(),
-          t.from.toLowerCase(), t.to.toLowerCase(), t.value
+          t.from.toLowerCase(), t.to.toLowerCase(), t.value,
+          blockTimestamps.get(t.blockNumber) ?? null
         ]);
 
         await batchInsertChunked(
           client,
           'erc20_transfers',
-          ['transaction_hash', 'log_index', 'block_number', 'token_address', 'from_address', 'to_address', 'value'],
+          ['transaction_hash', 'log_index', 'block_number', 'token_address', 'from_address', 'to_address', 'value', 'block_timestamp'],
           transferRows,
           undefined,  // No ON CONFLICT
           500
@@ -354,13 +359,14 @@ export class BackgroundDBWriter {
       if (erc721Transfers.length > 0) {
         const transferRows = erc721Transfers.map(t => [
           t.txHash, t.logIndex, t.blockNumber, t.tokenAddress.toLowerCase(),
-          t.from.toLowerCase(), t.to.toLowerCase(), t.tokenId
+          t.from.toLowerCase(), t.to.toLowerCase(), t.tokenId,
+          blockTimestamps.get(t.blockNumber) ?? null
         ]);
 
         await batchInsertChunked(
           client,
           'erc721_transfers',
-          ['transaction_hash', 'log_index', 'block_number', 'token_address', 'from_address', 'to_address', 'token_id'],
+          ['transaction_hash', 'log_index', 'block_number', 'token_address', 'from_address', 'to_address', 'token_id', 'block_timestamp'],
           transferRows,
           undefined,  // No ON CONFLICT
           500